@@ -8,8 +8,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 def inicializar_sistema():
     """Inicializa o sistema criando tabelas necessárias"""
     try:
-        from src.database.models import create_tables
-        return create_tables()
+        from src.database.models import garantir_schema
+        return garantir_schema()
     except Exception as e:
         st.error(f"Erro na inicialização: {str(e)}")
         return False
@@ -0,0 +1,4 @@
+"""
+Módulo de benchmarks
+Contém o gerador de fichas sintéticas e a medição de desempenho da extração
+"""
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import resource
+import statistics
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Cenários de tamanho: folhas de anexos, linhas por anexo e fotos embutidas
+CENARIOS = {
+    'simples': {'folhas_extras': 0, 'linhas_extras': 0, 'imagens': 0},
+    'media': {'folhas_extras': 2, 'linhas_extras': 2000, 'imagens': 2},
+    'grande': {'folhas_extras': 5, 'linhas_extras': 10000, 'imagens': 8},
+}
+
+OPERACOES = ['ler_dados_excel', 'validar_arquivo_excel', 'processar_multiplos_arquivos',
+             'processar_multiplos_arquivos_paralelo']
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+def _pico_rss_mb():
+    """Maior RSS do processo e dos seus filhos (pool de extração), em MB"""
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024  # bytes no macOS, KB no Linux
+    return round(max(proprio, filhos) / divisor, 1)
+
+def _medir(operacao, conteudos, repeticoes):
+    """Executada em um processo novo para que o pico de RSS seja da operação medida"""
+    import logging
+    from src.processing import parse_cache
+    from src.processing.excel_processor import ler_dados_excel, validar_arquivo_excel, processar_multiplos_arquivos
+    
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    os.environ['FICHAS_CACHE_DB'] = ''  # mede sempre a extração, nunca o cache
+    
+    # Aquecimento fora da medição (imports tardios de openpyxl/xlrd/SQLAlchemy)
+    ler_dados_excel(conteudos[0])
+    validar_arquivo_excel(conteudos[0])
+    
+    latencias = []
+    inicio_total = time.perf_counter()
+    for _ in range(repeticoes):
+        if operacao in ('ler_dados_excel', 'validar_arquivo_excel'):
+            funcao = ler_dados_excel if operacao == 'ler_dados_excel' else validar_arquivo_excel
+            for conteudo in conteudos:
+                parse_cache.limpar_cache()
+                inicio = time.perf_counter()
+                funcao(conteudo)
+                latencias.append(time.perf_counter() - inicio)
+        else:
+            parse_cache.limpar_cache()
+            inicio = time.perf_counter()
+            processar_multiplos_arquivos(conteudos, paralelo=operacao.endswith('_paralelo'))
+            latencias.append(time.perf_counter() - inicio)
+    duracao_total = time.perf_counter() - inicio_total
+    
+    return {
+        'amostras': len(latencias),
+        'p50_ms': round(_percentil(latencias, 50) * 1000, 2),
+        'p95_ms': round(_percentil(latencias, 95) * 1000, 2),
+        'media_ms': round(statistics.mean(latencias) * 1000, 2),
+        'arquivos_por_s': round(len(conteudos) * repeticoes / duracao_total, 2),
+        'pico_rss_mb': _pico_rss_mb(),
+    }
+
+def _versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def executar_benchmark(cenarios, formatos, arquivos=20, repeticoes=3, operacoes=OPERACOES):
+    """Gera as fichas sintéticas e mede cada operação; retorna o relatório (serializável em JSON)"""
+    from benchmarks.gerador_fichas import gerar_fichas
+    
+    contexto = multiprocessing.get_context('spawn')
+    resultados = []
+    
+    for formato in formatos:
+        if formato == 'xls':
+            try:
+                import xlwt  # noqa: F401
+            except ImportError:
+                print("xlwt não instalado: cenários .xls ignorados (pip install xlwt)", file=sys.stderr)
+                continue
+        
+        for nome_cenario in cenarios:
+            conteudos = gerar_fichas(arquivos, formato=formato, **CENARIOS[nome_cenario])
+            tamanho_medio = sum(len(c) for c in conteudos) / len(conteudos)
+            
+            for operacao in operacoes:
+                with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                    metricas = pool.submit(_medir, operacao, conteudos, repeticoes).result()
+                
+                resultado = {
+                    'formato': formato,
+                    'cenario': nome_cenario,
+                    'operacao': operacao,
+                    'arquivos': arquivos,
+                    'tamanho_medio_kb': round(tamanho_medio / 1024, 1),
+                    **metricas,
+                }
+                resultados.append(resultado)
+                print(f"{formato:4} {nome_cenario:8} {operacao:38} p50={resultado['p50_ms']:>9.2f}ms "
+                      f"p95={resultado['p95_ms']:>9.2f}ms {resultado['arquivos_por_s']:>8.1f} arq/s "
+                      f"rss={resultado['pico_rss_mb']}MB", file=sys.stderr, flush=True)
+    
+    return {
+        'gerado_em': datetime.datetime.now().isoformat(),
+        'versao_codigo': _versao_codigo(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'parametros': {'arquivos': arquivos, 'repeticoes': repeticoes, 'cenarios': {c: CENARIOS[c] for c in cenarios}},
+        'resultados': resultados,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da extração de fichas (latência, RSS e vazão)")
+    parser.add_argument('--cenarios', nargs='+', choices=list(CENARIOS), default=['simples', 'media'])
+    parser.add_argument('--formatos', nargs='+', choices=['xlsx', 'xls'], default=['xlsx', 'xls'])
+    parser.add_argument('--operacoes', nargs='+', choices=OPERACOES, default=OPERACOES)
+    parser.add_argument('--arquivos', type=int, default=20, help="Fichas geradas por cenário")
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', help="Arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args()
+    
+    relatorio = executar_benchmark(args.cenarios, args.formatos, args.arquivos, args.repeticoes, args.operacoes)
+    
+    texto = json.dumps(relatorio, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+if __name__ == '__main__':
+    main()
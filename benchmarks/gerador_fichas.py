@@ -0,0 +1,113 @@
+import io
+import random
+import datetime
+from src.processing.cell_templates import CELULAS_FICHA_PADRAO
+from src.database.models import CLASSIFICACOES_ARTESP, CLASSIFICACOES_ANTT
+
+CONCESSIONARIAS = ['AutoBAn', 'CCR ViaOeste', 'Ecovias', 'Arteris Intervias', 'Rota das Bandeiras', 'Entrevias']
+RODOVIAS = ['SP-330', 'SP-348', 'SP-280', 'SP-160', 'SP-310', 'BR-116', 'BR-381']
+SENTIDOS = ['Norte', 'Sul', 'Leste', 'Oeste', 'Capital', 'Interior']
+OBRAS = ['Ponte', 'Viaduto', 'Passarela', 'Galeria', 'Pontilhão']
+PAVIMENTOS = ['CBUQ', 'Concreto', 'Paralelepípedo', 'Sem pavimento']
+
+def gerar_valores_ficha(indice, orgao='ARTESP', semente=None):
+    """Gera os valores de uma ficha realista (campos do mapa de células)"""
+    aleatorio = random.Random(semente if semente is not None else indice)
+    classificacoes = CLASSIFICACOES_ARTESP if orgao == 'ARTESP' else CLASSIFICACOES_ANTT
+    data = datetime.datetime(2018, 1, 1) + datetime.timedelta(days=aleatorio.randint(0, 7 * 365))
+    
+    return {
+        'concessionaria': aleatorio.choice(CONCESSIONARIAS),
+        'rodovia': aleatorio.choice(RODOVIAS),
+        'obra': f"{aleatorio.choice(OBRAS)} sobre o córrego {indice}",
+        'sentido': aleatorio.choice(SENTIDOS),
+        'km': f"{aleatorio.randint(0, 600)}+{aleatorio.randint(0, 999):03d}",
+        'ic': str(aleatorio.randint(1, 5)),
+        'uir': str(aleatorio.randint(1, 5)),
+        'uie': str(aleatorio.randint(1, 5)),
+        'data_inspecao': data,
+        'ano_inspecao': data.year,
+        'codigo': f"OAE-{indice:06d}",
+        'codigo_artesp': f"ART-{indice:06d}" if orgao == 'ARTESP' else None,
+        'tipo_pav': aleatorio.choice(PAVIMENTOS),
+        'estrutural': aleatorio.choice(classificacoes),
+        'funcional': aleatorio.choice(classificacoes),
+        'durabilidade': aleatorio.choice(classificacoes),
+    }
+
+def _gerar_imagem(formato, lado=256):
+    from PIL import Image
+    
+    imagem = Image.effect_noise((lado, lado), 64).convert('RGB')
+    saida = io.BytesIO()
+    imagem.save(saida, format=formato)
+    saida.seek(0)
+    return saida
+
+def gerar_ficha_xlsx(valores, folhas_extras=0, linhas_extras=0, imagens=0):
+    """Gera uma ficha .xlsx no layout de CELULAS_FICHA_PADRAO, com folhas de anexos e fotos opcionais"""
+    from openpyxl import Workbook
+    
+    wb = Workbook()
+    ws = wb.active
+    ws.title = 'Ficha'
+    for campo, (linha, coluna, _) in CELULAS_FICHA_PADRAO.items():
+        if valores.get(campo) is not None:
+            ws.cell(row=linha + 1, column=coluna + 1, value=valores[campo])
+    
+    for n in range(folhas_extras):
+        anexo = wb.create_sheet(f'Anexo {n + 1}')
+        for linha in range(1, linhas_extras + 1):
+            anexo.append([linha, f"Elemento {linha}", 'Fissura', random.random() * 10, 'Observação de campo'])
+    
+    if imagens:
+        from openpyxl.drawing.image import Image as ImagemPlanilha
+        
+        fotos = wb.create_sheet('Fotos')
+        for n in range(imagens):
+            fotos.add_image(ImagemPlanilha(_gerar_imagem('PNG')), f"A{1 + n * 15}")
+    
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
+
+def gerar_ficha_xls(valores, folhas_extras=0, linhas_extras=0, imagens=0):
+    """Gera uma ficha .xls (BIFF) equivalente; requer o pacote opcional xlwt"""
+    import xlwt
+    
+    wb = xlwt.Workbook()
+    ws = wb.add_sheet('Ficha')
+    estilo_data = xlwt.easyxf(num_format_str='DD/MM/YYYY')
+    for campo, (linha, coluna, _) in CELULAS_FICHA_PADRAO.items():
+        valor = valores.get(campo)
+        if valor is None:
+            continue
+        if isinstance(valor, datetime.datetime):
+            ws.write(linha, coluna, valor, estilo_data)
+        else:
+            ws.write(linha, coluna, valor)
+    
+    # Formato BIFF: no máximo 65536 linhas por planilha
+    for n in range(folhas_extras):
+        anexo = wb.add_sheet(f'Anexo {n + 1}')
+        for linha in range(min(linhas_extras, 65535)):
+            for coluna, valor in enumerate([linha, f"Elemento {linha}", 'Fissura', random.random() * 10]):
+                anexo.write(linha, coluna, valor)
+    
+    if imagens:
+        fotos = wb.add_sheet('Fotos')
+        for n in range(imagens):
+            fotos.insert_bitmap_data(_gerar_imagem('BMP').getvalue(), n * 15, 0)
+    
+    saida = io.BytesIO()
+    wb.save(saida)
+    return saida.getvalue()
+
+def gerar_fichas(quantidade, formato='xlsx', folhas_extras=0, linhas_extras=0, imagens=0):
+    """Gera `quantidade` fichas sintéticas (alternando ARTESP/ANTT) e retorna a lista de bytes"""
+    gerador = gerar_ficha_xlsx if formato == 'xlsx' else gerar_ficha_xls
+    return [
+        gerador(gerar_valores_ficha(indice, 'ARTESP' if indice % 2 == 0 else 'ANTT'),
+                folhas_extras=folhas_extras, linhas_extras=linhas_extras, imagens=imagens)
+        for indice in range(quantidade)
+    ]
@@ -9,17 +9,27 @@ try:
     from .s3_handler import (
         salvar_arquivo_s3,
         listar_arquivos_s3,
-        baixar_arquivo_s3
+        baixar_arquivo_s3,
+        publicar_arquivo_s3,
+        gerar_url_download_s3
     )
 except ImportError:
     def salvar_arquivo_s3(nome_arquivo, conteudo):
         return f"mock_s3_key_{nome_arquivo}"
     
-    def listar_arquivos_s3(prefixo=''):
+    def listar_arquivos_s3(prefixo='', propagar_erros=False):
+        if propagar_erros:
+            raise RuntimeError("S3 não disponível")
         return []
     
     def baixar_arquivo_s3(chave_s3):
         return None
+    
+    def publicar_arquivo_s3(caminho_local, nome_arquivo, content_type=None, pasta="exportacoes"):
+        return None
+    
+    def gerar_url_download_s3(chave_s3, expira_em=3600, nome_download=None):
+        return None
 
 def test_aws_connection():
     """Testa conexão com serviços AWS"""
@@ -29,6 +39,8 @@ __all__ = [
     'salvar_arquivo_s3',
     'listar_arquivos_s3', 
     'baixar_arquivo_s3',
+    'publicar_arquivo_s3',
+    'gerar_url_download_s3',
     'test_aws_connection'
 ]
 
@@ -90,13 +90,59 @@ def salvar_pdf_sem_duplicata(nome_arquivo, conteudo, pasta="relatorios_pdf"):
         st.error(f"Erro ao salvar PDF no S3: {str(e)}")
         return None
 
-def listar_arquivos_s3(prefixo=''):
-    """Lista arquivos no S3 com prefixo específico"""
+def publicar_arquivo_s3(caminho_local, nome_arquivo, content_type=None, pasta="exportacoes"):
+    """Envia um arquivo local ao S3 (upload multipart, sem carregá-lo em memória) e retorna a chave"""
     try:
         s3_client = get_s3_client()
         bucket = get_s3_bucket()
         
         if not s3_client or not bucket:
+            st.warning("S3 não configurado")
+            return None
+        
+        data_upload = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+        chave_s3 = f'{pasta}/{data_upload}_{nome_arquivo}'
+        
+        extra_args = {'ContentType': content_type} if content_type else None
+        s3_client.upload_file(caminho_local, bucket, chave_s3, ExtraArgs=extra_args)
+        return chave_s3
+    
+    except Exception as e:
+        st.error(f"Erro ao publicar no S3: {str(e)}")
+        return None
+
+def gerar_url_download_s3(chave_s3, expira_em=3600, nome_download=None):
+    """URL pré-assinada para baixar um objeto do S3 diretamente do bucket"""
+    try:
+        s3_client = get_s3_client()
+        bucket = get_s3_bucket()
+        
+        if not s3_client or not bucket:
+            return None
+        
+        parametros = {'Bucket': bucket, 'Key': chave_s3}
+        if nome_download:
+            parametros['ResponseContentDisposition'] = f'attachment; filename="{nome_download}"'
+        
+        return s3_client.generate_presigned_url('get_object', Params=parametros, ExpiresIn=expira_em)
+    
+    except Exception as e:
+        st.error(f"Erro ao gerar link de download: {str(e)}")
+        return None
+
+def listar_arquivos_s3(prefixo='', propagar_erros=False):
+    """Lista arquivos no S3 com prefixo específico
+    
+    Com propagar_erros=True, S3 não configurado ou falha na listagem levantam exceção em vez de
+    devolver [] (quem processa "todos os arquivos" não pode confundir erro com prefixo vazio).
+    """
+    try:
+        s3_client = get_s3_client()
+        bucket = get_s3_bucket()
+        
+        if not s3_client or not bucket:
+            if propagar_erros:
+                raise RuntimeError("S3 não configurado")
             return []
         
         # Usar list_objects_v2 com paginação
@@ -129,6 +175,8 @@ def listar_arquivos_s3(prefixo=''):
         return arquivos
         
     except Exception as e:
+        if propagar_erros:
+            raise
         st.error(f"Erro ao listar arquivos S3: {str(e)}")
         return []
 
@@ -9,7 +9,10 @@ try:
         create_tables,
         get_fichas_table,
         metadata,
-        verificar_tabela_existe
+        verificar_tabela_existe,
+        verificar_duplicatas_lote,
+        garantir_schema,
+        invalidar_schema
     )
 except ImportError:
     fichas_table = None
@@ -17,13 +20,28 @@ except ImportError:
     get_fichas_table = lambda: None
     metadata = None
     verificar_tabela_existe = lambda: False
+    verificar_duplicatas_lote = lambda dados_lista, conn=None: [[] for _ in dados_lista]
+    garantir_schema = lambda: False
+    invalidar_schema = lambda: None
 
 try:
     from .crud_operations import (
         inserir_dados_banco,
+        inserir_lote_banco,
         obter_todos_registros,
+        obter_pagina_registros,
+        obter_fichas_por_trecho,
+        buscar_registros_selecao,
+        buscar_fichas,
+        contar_registros,
+        construir_condicoes_filtro,
+        obter_valores_distintos,
+        resumir_registros,
+        contar_por_valor,
         atualizar_registro,
+        atualizar_fichas_lote,
         deletar_registro,
+        deletar_fichas_lote,
         criar_novo_registro,
         obter_registro_por_id,
         testar_conexao_banco
@@ -31,17 +49,58 @@ try:
 except ImportError:
     # Funções vazias se não conseguir importar
     inserir_dados_banco = lambda x: False
-    obter_todos_registros = lambda: []
+    inserir_lote_banco = lambda x, usar_copy=None: None
+    obter_todos_registros = lambda colunas=None, filtros=None: []
+    obter_pagina_registros = lambda *args, **kwargs: {'dados': [], 'proximo_cursor': None, 'total': None}
+    obter_fichas_por_trecho = lambda *args, **kwargs: None
+    buscar_registros_selecao = lambda termo='', limite=20: []
+    buscar_fichas = lambda termo, *args, **kwargs: {'dados': [], 'pagina': 1, 'tem_proxima': False}
+    contar_registros = lambda filtros=None, estimado=False: 0
+    construir_condicoes_filtro = lambda filtros: []
+    obter_valores_distintos = lambda coluna, filtros=None: []
+    resumir_registros = lambda filtros=None: {}
+    contar_por_valor = lambda coluna, filtros=None: []
     atualizar_registro = lambda x, y: False
+    atualizar_fichas_lote = lambda alvo, dados: None
     deletar_registro = lambda x: False
+    deletar_fichas_lote = lambda alvo: None
     criar_novo_registro = lambda x: False
     obter_registro_por_id = lambda x: None
     testar_conexao_banco = lambda: False
 
+try:
+    from .rollup import obter_contagens_dashboard, reconstruir_rollup
+except ImportError:
+    obter_contagens_dashboard = lambda filtros=None: None
+    reconstruir_rollup = lambda conn=None: None
+
+try:
+    from .migrations import aplicar_migracoes, relatorio_planos
+except ImportError:
+    aplicar_migracoes = lambda engine=None, callback_progresso=None: []
+    relatorio_planos = lambda engine=None: {}
+
+try:
+    from .query_cache import estatisticas_cache, limpar_cache as limpar_cache_consultas
+except ImportError:
+    estatisticas_cache = lambda: {}
+    limpar_cache_consultas = lambda: None
+
+try:
+    from .replica_analitica import sincronizar_replica
+except ImportError:
+    sincronizar_replica = lambda engine=None: 0
+
+try:
+    from .exportacao import exportar_registros, gerar_exportacao
+except ImportError:
+    exportar_registros = lambda formato, destino, filtros=None, colunas=None: 0
+    gerar_exportacao = lambda formato, filtros=None, colunas=None: None
+
 def init_database():
     """Inicializa o banco de dados criando as tabelas necessárias"""
     try:
-        return create_tables()
+        return garantir_schema()
     except Exception as e:
         print(f"Erro ao inicializar banco: {e}")
         return False
@@ -52,12 +111,36 @@ __all__ = [
     'get_fichas_table',
     'metadata',
     'verificar_tabela_existe',
+    'verificar_duplicatas_lote',
+    'garantir_schema',
+    'invalidar_schema',
     'inserir_dados_banco',
+    'inserir_lote_banco',
     'obter_todos_registros',
+    'obter_pagina_registros',
+    'obter_fichas_por_trecho',
+    'buscar_registros_selecao',
+    'buscar_fichas',
+    'contar_registros',
+    'construir_condicoes_filtro',
+    'obter_valores_distintos',
+    'resumir_registros',
+    'contar_por_valor',
     'atualizar_registro',
+    'atualizar_fichas_lote',
     'deletar_registro',
+    'deletar_fichas_lote',
     'criar_novo_registro',
     'obter_registro_por_id',
     'testar_conexao_banco',
+    'obter_contagens_dashboard',
+    'reconstruir_rollup',
+    'aplicar_migracoes',
+    'relatorio_planos',
+    'estatisticas_cache',
+    'limpar_cache_consultas',
+    'sincronizar_replica',
+    'exportar_registros',
+    'gerar_exportacao',
     'init_database'
 ]
@@ -1,81 +1,638 @@
+import io
+import re
+import csv
 import streamlit as st
 import pandas as pd
 import datetime
-from utils.config import get_db_engine
-from src.database.models import get_fichas_table, create_tables, verificar_tabela_existe, verificar_duplicata_existe
-from sqlalchemy import text
+from utils.config import get_db_engine, conexao_banco, em_transacao_banco
+from src.database import query_cache, replica_analitica
+from src.database.models import (
+    get_fichas_table, garantir_schema, invalidar_schema_se_necessario,
+    verificar_duplicata_existe, verificar_duplicatas_lote, RESTRICOES_UNICAS, _chave_restricao,
+    DOCUMENTO_BUSCA_POSTGRES, TABELA_BUSCA_SQLITE
+)
+from src.database.rollup import aplicar_delta, calcular_delta, ler_estado_rollup, COLUNAS_ROLLUP_FICHA
+from src.processing.batch_normalizer import km_para_metros
+from sqlalchemy import text, bindparam, select, func, tuple_, or_, case, literal_column, table, column
+from sqlalchemy.exc import IntegrityError, DataError, DBAPIError
+
+# Em PostgreSQL (psycopg2), lotes a partir deste tamanho vão por COPY em vez de executemany
+LIMIAR_COPY = 1000
+
+COLUNAS_INSERCAO = [coluna.name for coluna in get_fichas_table().columns if coluna.name != 'id']
+
+def _com_km_m(dados):
+    """km_m sempre derivado do km gravado (toda escrita que altera km recalcula os metros)"""
+    if 'km' not in dados:
+        return dados
+    return {**dados, 'km_m': km_para_metros(dados['km'])}
+
+def _linhas_insercao(dados_lista):
+    """Mesmas chaves em todas as linhas (exigência do executemany), só com colunas da tabela"""
+    return [{coluna: dados.get(coluna) for coluna in COLUNAS_INSERCAO} for dados in map(_com_km_m, dados_lista)]
+
+def _eh_erro_duplicata(erro):
+    mensagem = str(erro)
+    return "duplicate key" in mensagem or "UNIQUE constraint" in mensagem
+
+def _inserir_copy(conn, linhas):
+    """COPY para uma tabela temporária + INSERT ... SELECT: o lote inteiro em uma ida ao servidor"""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for linha in linhas:
+        escritor.writerow(['\\N' if linha[coluna] is None else linha[coluna] for coluna in COLUNAS_INSERCAO])
+    buffer.seek(0)
+    
+    colunas = ', '.join(COLUNAS_INSERCAO)
+    conn.execute(text(f"CREATE TEMP TABLE fichas_copia ON COMMIT DROP AS SELECT {colunas} FROM fichas_inspecao WITH NO DATA"))
+    comando = f"COPY fichas_copia ({colunas}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    cursor = conn.connection.cursor()
+    try:
+        cursor.copy_expert(comando, buffer)
+    except conn.dialect.loaded_dbapi.Error as e:
+        # O cursor cru não passa pelo SQLAlchemy: o erro do psycopg2 vira a exceção equivalente
+        # (DataError, IntegrityError...), que volta ao savepoint e cai na inserção ficha a ficha
+        raise DBAPIError.instance(comando, None, e, conn.dialect.loaded_dbapi.Error, dialect=conn.dialect) from e
+    finally:
+        cursor.close()
+    conn.execute(text(f"INSERT INTO fichas_inspecao ({colunas}) SELECT {colunas} FROM fichas_copia"))
+
+def _inserir_linha_a_linha(conn, indices, linhas, resultados):
+    """Reinsere ficha a ficha (com savepoint) para apontar quais linhas o banco recusou"""
+    fichas_table = get_fichas_table()
+    
+    inseridas = []
+    for indice, linha in zip(indices, linhas):
+        try:
+            with conn.begin_nested():
+                conn.execute(fichas_table.insert(), linha)
+            resultados[indice] = {'status': 'inserido', 'mensagem': None}
+            inseridas.append(linha)
+        except (IntegrityError, DataError) as e:
+            status = 'duplicado' if _eh_erro_duplicata(e) else 'rejeitado'
+            resultados[indice] = {'status': status, 'mensagem': str(getattr(e, 'orig', e))}
+    return inseridas
+
+def inserir_lote_banco(dados_lista, usar_copy=None):
+    """Insere um lote de fichas com um único executemany (ou COPY, em lotes grandes no PostgreSQL)
+    
+    Verificação de duplicatas, inserção e rollup usam uma só conexão e uma só transação.
+    Retorna {'inseridos', 'duplicados', 'rejeitados', 'resultados'}, com um resultado por ficha na
+    ordem recebida ({'status': 'inserido' | 'duplicado' | 'rejeitado', 'mensagem'}), ou None em caso de erro.
+    """
+    try:
+        if not garantir_schema():
+            return None
+        
+        engine = get_db_engine()
+        if engine is None:
+            st.error("Conexão com banco não disponível")
+            return None
+        
+        resultados = [None] * len(dados_lista)
+        with conexao_banco(transacao=True) as conn:
+            conflitos = verificar_duplicatas_lote(dados_lista, conn)
+            if conflitos is None:
+                return None
+            
+            novos = []
+            for indice, (dados, restricoes) in enumerate(zip(dados_lista, conflitos)):
+                dados['data_upload'] = datetime.date.today()
+                
+                if restricoes:
+                    resultados[indice] = {'status': 'duplicado', 'mensagem': f"Ficha já existe ({', '.join(restricoes)})"}
+                else:
+                    novos.append(indice)
+            
+            if novos:
+                linhas = _linhas_insercao([dados_lista[indice] for indice in novos])
+                if usar_copy is None:
+                    usar_copy = len(linhas) >= LIMIAR_COPY and engine.dialect.driver == 'psycopg2'
+                
+                try:
+                    with conn.begin_nested():
+                        if usar_copy:
+                            _inserir_copy(conn, linhas)
+                        else:
+                            conn.execute(get_fichas_table().insert(), linhas)
+                    for indice in novos:
+                        resultados[indice] = {'status': 'inserido', 'mensagem': None}
+                    inseridas = linhas
+                except DBAPIError as e:
+                    # Recusas de dados/restrições (no COPY, qualquer erro do banco): o lote voltou ao
+                    # savepoint, refazer ficha a ficha para saber qual falhou
+                    if not usar_copy and not isinstance(e, (IntegrityError, DataError)):
+                        raise
+                    inseridas = _inserir_linha_a_linha(conn, novos, linhas, resultados)
+                aplicar_delta(conn, calcular_delta(fichas_adicionadas=inseridas))
+                query_cache.registrar_escrita(conn)
+        
+        if novos:
+            _invalidar_caches_leitura()
+        
+        status = [resultado['status'] for resultado in resultados]
+        return {
+            'inseridos': status.count('inserido'),
+            'duplicados': status.count('duplicado'),
+            'rejeitados': status.count('rejeitado'),
+            'resultados': resultados,
+        }
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao inserir no banco: {str(e)}")
+        return None
 
 def inserir_dados_banco(dados_lista):
     """Insere dados no banco com verificação de duplicatas"""
+    resultado = inserir_lote_banco(dados_lista)
+    if resultado is None:
+        return False
+    
+    for dados, item in zip(dados_lista, resultado['resultados']):
+        if item['status'] == 'duplicado':
+            st.warning(f"⚠️ Ficha duplicada ignorada: {dados.get('codigo', 'sem código')}")
+        elif item['status'] == 'rejeitado':
+            st.warning(f"⚠️ Ficha rejeitada pelo banco ({dados.get('codigo', 'sem código')}): {item['mensagem']}")
+    
+    if resultado['inseridos']:
+        st.success(f"✅ {resultado['inseridos']} ficha(s) inserida(s) com sucesso!")
+    
+    if resultado['duplicados']:
+        st.info(f"ℹ️ {resultado['duplicados']} ficha(s) duplicada(s) foram ignoradas")
+    
+    return resultado['inseridos'] > 0
+
+# Ordenação padrão das listagens; a paginação por chave (keyset) usa o par (data_upload, id)
+TAMANHO_PAGINA_PADRAO = 50
+
+def construir_condicoes_filtro(filtros, tabela=None):
+    """Converte a especificação de filtros dos widgets em condições parametrizadas do WHERE
+    
+    {coluna: valor} vira igualdade; listas/tuplas/conjuntos viram IN; {'min': a, 'max': b} vira faixa.
+    None, listas vazias e faixas sem limites são ignorados (equivalem a "Todos").
+    As condições usam fichas_inspecao, ou outra tabela com as mesmas colunas (ex.: o rollup).
+    """
+    tabela = tabela if tabela is not None else get_fichas_table()
+    condicoes = []
+    for coluna, valor in (filtros or {}).items():
+        if coluna not in tabela.c:
+            raise ValueError(f"Coluna de filtro desconhecida: {coluna}")
+        campo = tabela.c[coluna]
+        
+        if valor is None:
+            continue
+        elif isinstance(valor, dict):
+            if valor.get('min') is not None:
+                condicoes.append(campo >= _valor_sql(valor['min']))
+            if valor.get('max') is not None:
+                condicoes.append(campo <= _valor_sql(valor['max']))
+        elif isinstance(valor, (list, tuple, set)):
+            if len(valor):
+                condicoes.append(campo.in_([_valor_sql(v) for v in valor]))
+        else:
+            condicoes.append(campo == _valor_sql(valor))
+    return condicoes
+
+def _aplicar_filtros(stmt, filtros):
+    condicoes = construir_condicoes_filtro(filtros)
+    return stmt.where(*condicoes) if condicoes else stmt
+
+def _valor_sql(valor):
+    """Escalares numpy (vindos de DataFrames/widgets) viram tipos Python, que o driver aceita"""
+    return valor.item() if hasattr(valor, 'item') else valor
+
+def _ler_em_cache(stmt, ler, *extras, tabelas=(query_cache.TABELA_FICHAS,), ttl=query_cache.TTL_PADRAO_S):
+    """Executa ler(conn) pelo cache de consultas do processo (chave: SQL compilado + parâmetros + extras)
+    
+    Dentro de uma transação de escrita a leitura vai direto ao banco: ela enxerga dados ainda sem
+    commit, que não podem ser servidos a outras sessões.
+    """
+    def carregar():
+        with conexao_banco() as conn:
+            return ler(conn)
+    
+    if em_transacao_banco():
+        return carregar()
+    return query_cache.obter_ou_carregar(query_cache.chave_consulta(stmt, *extras), carregar, tabelas, ttl)
+
+def _ler_agregado(stmt, ler):
+    """Agregações do dashboard: réplica analítica (DuckDB) quando atualizada, senão o banco principal
+    
+    ler(conn) recebe a conexão do banco principal; o resultado da réplica vem como DataFrame.
+    """
+    def carregar():
+        df = replica_analitica.ler_analitico(stmt)
+        if df is not None:
+            return df
+        with conexao_banco() as conn:
+            return ler(conn)
+    
+    if em_transacao_banco():
+        with conexao_banco() as conn:
+            return ler(conn)
+    return query_cache.obter_ou_carregar(query_cache.chave_consulta(stmt), carregar)
+
+# Opções de filtro mudam pouco: podem ficar mais tempo em cache (as escritas as invalidam)
+TTL_VALORES_DISTINTOS = 600
+
+def _consultar_valores_distintos(coluna, filtros):
+    campo = get_fichas_table().c[coluna]
+    stmt = _aplicar_filtros(select(campo).distinct().where(campo.isnot(None)), filtros).order_by(campo)
+    return _ler_em_cache(stmt, lambda conn: [linha[0] for linha in conn.execute(stmt)], ttl=TTL_VALORES_DISTINTOS)
+
+def obter_valores_distintos(coluna, filtros=None):
+    """Valores distintos (não nulos) de uma coluna, ordenados - opções dos filtros via SELECT DISTINCT"""
+    try:
+        if not garantir_schema() or get_db_engine() is None:
+            return []
+        return _consultar_valores_distintos(coluna, filtros)
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao carregar opções de filtro: {str(e)}")
+        return []
+
+def _invalidar_caches_leitura():
+    """Chamada após o commit de qualquer escrita na tabela de fichas (que também atualiza o rollup)"""
+    query_cache.incrementar_versao(query_cache.TABELA_FICHAS, query_cache.TABELA_ROLLUP)
+
+def resumir_registros(filtros=None):
+    """Estatísticas das fichas filtradas em uma consulta: total, concessionárias, rodovias e faixa de anos"""
+    resumo_vazio = {'total': 0, 'concessionarias': 0, 'rodovias': 0, 'anos': 0, 'ano_min': None, 'ano_max': None}
     try:
-        if not verificar_tabela_existe():
-            if not create_tables():
-                return False
+        if not garantir_schema():
+            return resumo_vazio
         
         engine = get_db_engine()
+        if engine is None:
+            return resumo_vazio
+        
         fichas_table = get_fichas_table()
+        stmt = _aplicar_filtros(select(
+            func.count().label('total'),
+            func.count(fichas_table.c.concessionaria.distinct()).label('concessionarias'),
+            func.count(fichas_table.c.rodovia.distinct()).label('rodovias'),
+            func.count(fichas_table.c.ano_inspecao.distinct()).label('anos'),
+            func.min(fichas_table.c.ano_inspecao).label('ano_min'),
+            func.max(fichas_table.c.ano_inspecao).label('ano_max'),
+        ), filtros)
+        
+        resumo = _ler_agregado(stmt, lambda conn: pd.read_sql(stmt, conn))
+        return {chave: None if pd.isna(valor) else _valor_sql(valor) for chave, valor in resumo.iloc[0].items()}
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao resumir registros: {str(e)}")
+        return resumo_vazio
+
+def contar_por_valor(coluna, filtros=None):
+    """Quantidade de fichas por valor da coluna (GROUP BY no banco), sem nulos; DataFrame [coluna, quantidade]"""
+    try:
+        if not garantir_schema():
+            return pd.DataFrame(columns=[coluna, 'quantidade'])
         
-        dados_inseridos = []
-        dados_duplicados = []
+        engine = get_db_engine()
+        if engine is None:
+            return pd.DataFrame(columns=[coluna, 'quantidade'])
         
-        for dados in dados_lista:
-            dados['data_upload'] = datetime.date.today()
-            
-            if verificar_duplicata_existe(dados):
-                dados_duplicados.append(dados)
-                st.warning(f"⚠️ Ficha duplicada ignorada: {dados.get('codigo', 'sem código')}")
+        campo = get_fichas_table().c[coluna]
+        stmt = _aplicar_filtros(
+            select(campo, func.count().label('quantidade')).where(campo.isnot(None)), filtros
+        ).group_by(campo).order_by(campo)
+        
+        return _ler_agregado(stmt, lambda conn: pd.read_sql(stmt, conn))
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao agrupar registros: {str(e)}")
+        return pd.DataFrame(columns=[coluna, 'quantidade'])
+
+def _colunas_selecionadas(colunas):
+    fichas_table = get_fichas_table()
+    if not colunas:
+        return list(fichas_table.columns)
+    return [fichas_table.c[coluna] for coluna in colunas]
+
+def _ordenacao_listagem():
+    fichas_table = get_fichas_table()
+    return [fichas_table.c.data_upload.desc().nullslast(), fichas_table.c.id.desc()]
+
+def contar_registros(filtros=None, estimado=False):
+    """Conta as fichas (com filtros opcionais)
+    
+    Com estimado=True e sem filtros, usa a estimativa do planner no PostgreSQL (pg_class.reltuples),
+    sem varrer a tabela.
+    """
+    try:
+        if not garantir_schema():
+            return 0
+        
+        engine = get_db_engine()
+        if engine is None:
+            return 0
+        
+        if estimado and not filtros and engine.dialect.name == 'postgresql':
+            with conexao_banco() as conn:
+                estimativa = conn.execute(text(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = 'fichas_inspecao'::regclass"
+                )).scalar()
+            if estimativa is not None and estimativa >= 0:
+                return int(estimativa)
+        
+        stmt = _aplicar_filtros(select(func.count()).select_from(get_fichas_table()), filtros)
+        return _ler_em_cache(stmt, lambda conn: conn.execute(stmt).scalar())
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao contar registros: {str(e)}")
+        return 0
+
+def obter_pagina_registros(tamanho_pagina=TAMANHO_PAGINA_PADRAO, cursor=None, colunas=None, filtros=None,
+                           incluir_total=False):
+    """Uma página de fichas em ordem (data_upload DESC, id DESC), paginada por chave
+    
+    cursor é o 'proximo_cursor' da página anterior (None = primeira página); id e data_upload
+    sempre vêm na projeção, pois formam o cursor.
+    Retorna {'dados': DataFrame, 'proximo_cursor': (data_upload, id) ou None, 'total': int ou None}.
+    """
+    pagina_vazia = {'dados': pd.DataFrame(), 'proximo_cursor': None, 'total': 0 if incluir_total else None}
+    try:
+        if not garantir_schema():
+            return pagina_vazia
+        
+        engine = get_db_engine()
+        if engine is None:
+            return pagina_vazia
+        
+        fichas_table = get_fichas_table()
+        if colunas:
+            colunas = list(dict.fromkeys(['id', 'data_upload'] + list(colunas)))
+        
+        base = _aplicar_filtros(select(*_colunas_selecionadas(colunas)), filtros)
+        sem_data = base.where(fichas_table.c.data_upload.is_(None))
+        # Uma linha a mais indica se existe próxima página
+        limite = tamanho_pagina + 1
+        
+        def ler(conn):
+            if cursor is None:
+                df = pd.read_sql(base.order_by(*_ordenacao_listagem()).limit(limite), conn)
+            elif cursor[0] is None:
+                df = pd.read_sql(
+                    sem_data.where(fichas_table.c.id < cursor[1]).order_by(fichas_table.c.id.desc()).limit(limite), conn
+                )
             else:
-                dados_inseridos.append(dados)
-        
-        if dados_inseridos:
-            with engine.begin() as conn:
-                for dados in dados_inseridos:
-                    try:
-                        stmt = fichas_table.insert().values(**dados)
-                        conn.execute(stmt)
-                    except Exception as e:
-                        if "duplicate key" in str(e) or "UNIQUE constraint" in str(e):
-                            st.warning(f"⚠️ Duplicata detectada pelo banco: {dados.get('codigo', 'sem código')}")
-                        else:
-                            raise e
+                # Comparação de linha sem OR: uma faixa contínua do índice de listagem.
+                # As fichas sem data_upload ficam no fim e só são lidas se a página não encher
+                df = pd.read_sql(
+                    base.where(tuple_(fichas_table.c.data_upload, fichas_table.c.id) < tuple_(*cursor))
+                    .order_by(*_ordenacao_listagem()).limit(limite), conn
+                )
+                if len(df) < limite:
+                    df_sem_data = pd.read_sql(sem_data.order_by(fichas_table.c.id.desc()).limit(limite - len(df)), conn)
+                    if not df_sem_data.empty:
+                        df = pd.concat([df, df_sem_data], ignore_index=True) if not df.empty else df_sem_data
             
-            st.success(f"✅ {len(dados_inseridos)} ficha(s) inserida(s) com sucesso!")
+            # A contagem reaproveita a conexão da página
+            total = contar_registros(filtros) if incluir_total else None
+            return df, total
         
-        if dados_duplicados:
-            st.info(f"ℹ️ {len(dados_duplicados)} ficha(s) duplicada(s) foram ignoradas")
+        df, total = _ler_em_cache(base, ler, 'pagina', cursor, tamanho_pagina, incluir_total)
         
-        return len(dados_inseridos) > 0
+        proximo_cursor = None
+        if len(df) > tamanho_pagina:
+            df = df.iloc[:tamanho_pagina]
+            ultima = df.iloc[-1]
+            data_ultima = ultima['data_upload']
+            proximo_cursor = (None if pd.isna(data_ultima) else data_ultima, int(ultima['id']))
         
+        return {
+            'dados': df,
+            'proximo_cursor': proximo_cursor,
+            'total': total,
+        }
+    
     except Exception as e:
-        st.error(f"Erro ao inserir no banco: {str(e)}")
-        return False
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao carregar página de registros: {str(e)}")
+        return pagina_vazia
 
-def obter_todos_registros():
-    """Obtém todos os registros do banco"""
+def obter_todos_registros(colunas=None, filtros=None):
+    """Obtém todos os registros do banco (apenas as colunas e linhas pedidas)"""
     try:
-        if not verificar_tabela_existe():
-            if not create_tables():
-                return pd.DataFrame()
+        if not garantir_schema():
+            return pd.DataFrame()
         
         engine = get_db_engine()
         if engine is None:
             return pd.DataFrame()
         
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM fichas_inspecao"))
-            count = result.scalar()
-            
-            if count == 0:
-                st.info("Tabela vazia. Faça upload de arquivos para popular os dados.")
-                return pd.DataFrame()
-            
-            df = pd.read_sql(text("SELECT * FROM fichas_inspecao ORDER BY data_upload DESC"), conn)
-            return df
-            
+        stmt = _aplicar_filtros(select(*_colunas_selecionadas(colunas)), filtros).order_by(*_ordenacao_listagem())
+        
+        df = _ler_em_cache(stmt, lambda conn: pd.read_sql(stmt, conn))
+        
+        if df.empty and not filtros:
+            st.info("Tabela vazia. Faça upload de arquivos para popular os dados.")
+        return df
+    
     except Exception as e:
+        invalidar_schema_se_necessario(e)
         st.error(f"Erro ao carregar dados: {str(e)}")
         return pd.DataFrame()
 
+def _metros_do_limite(km):
+    metros = km_para_metros(km)
+    if metros is None:
+        raise ValueError(f"km inválido: {km}")
+    return metros
+
+def obter_fichas_por_trecho(rodovia, km_inicial=None, km_final=None, sentido=None, colunas=None, filtros=None):
+    """Fichas de um trecho da rodovia, ordenadas por km (faixa em km_m sobre o índice rodovia/sentido/km)
+    
+    km_inicial/km_final aceitam km numérico (100, 150.5) ou no formato da ficha ('100+000'); None deixa
+    a ponta aberta. Fichas cujo km não pôde ser convertido ficam de fora.
+    """
+    try:
+        if not garantir_schema():
+            return pd.DataFrame()
+        
+        if get_db_engine() is None:
+            return pd.DataFrame()
+        
+        fichas_table = get_fichas_table()
+        condicoes = [fichas_table.c.rodovia == rodovia, fichas_table.c.km_m.isnot(None)]
+        if sentido is not None:
+            condicoes.append(fichas_table.c.sentido == sentido)
+        if km_inicial is not None:
+            condicoes.append(fichas_table.c.km_m >= _metros_do_limite(km_inicial))
+        if km_final is not None:
+            condicoes.append(fichas_table.c.km_m <= _metros_do_limite(km_final))
+        
+        stmt = _aplicar_filtros(select(*_colunas_selecionadas(colunas)).where(*condicoes), filtros).order_by(
+            fichas_table.c.km_m, fichas_table.c.id
+        )
+        return _ler_em_cache(stmt, lambda conn: pd.read_sql(stmt, conn))
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao consultar trecho: {str(e)}")
+        return pd.DataFrame()
+
+# Seletor de fichas do CRUD: resultados por busca
+LIMITE_SELECAO_PADRAO = 20
+# Termos mais curtos quase não filtram por trigramas: buscam só pelo prefixo
+MINIMO_BUSCA_TRIGRAMA = 3
+
+def _escapar_like(termo):
+    """Curingas do termo viram literais (barra invertida: escape padrão do LIKE no PostgreSQL, explícito no SQLite)"""
+    return termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _consulta_selecao(termo, limite, dialeto):
+    """Busca do seletor em codigo, obra e concessionaria, com os códigos que começam pelo termo primeiro"""
+    fichas_table = get_fichas_table()
+    stmt = select(fichas_table.c.id, fichas_table.c.codigo, fichas_table.c.concessionaria, fichas_table.c.obra)
+    termo = (termo or '').strip()
+    if not termo:
+        return stmt.order_by(*_ordenacao_listagem()).limit(limite)
+    
+    colunas = [fichas_table.c.codigo, fichas_table.c.obra, fichas_table.c.concessionaria]
+    if dialeto == 'postgresql':
+        # Trecho em qualquer posição (índices GIN de trigramas)
+        escapado = _escapar_like(termo)
+        padrao = f"%{escapado}%" if len(termo) >= MINIMO_BUSCA_TRIGRAMA else f"{escapado}%"
+        condicoes = [coluna.ilike(padrao) for coluna in colunas]
+        prefixo_codigo = fichas_table.c.codigo.ilike(f"{escapado}%")
+    else:
+        # Prefixo: o LIKE do SQLite já ignora maiúsculas e só usa o índice NOCASE sem lower(); com ESCAPE
+        # o índice continua valendo ('_' e '%' digitados são literais, não curingas)
+        condicoes = [coluna.like(f"{_escapar_like(termo)}%", escape='\\') for coluna in colunas]
+        prefixo_codigo = condicoes[0]
+    
+    return stmt.where(or_(*condicoes)).order_by(
+        case((prefixo_codigo, 0), else_=1), fichas_table.c.codigo, fichas_table.c.id
+    ).limit(limite)
+
+def _rotulo_selecao(linha):
+    partes = [f"ID {linha.id}", linha.codigo, linha.concessionaria, linha.obra]
+    return " - ".join(str(parte) for parte in partes if parte)
+
+def buscar_registros_selecao(termo='', limite=LIMITE_SELECAO_PADRAO):
+    """Fichas para o seletor do CRUD, buscadas por código, obra ou concessionária
+    
+    Sem termo, traz as fichas mais recentes. Retorna até `limite` pares (id, rótulo), sem carregar a tabela.
+    """
+    try:
+        if not garantir_schema():
+            return []
+        
+        engine = get_db_engine()
+        if engine is None:
+            return []
+        
+        stmt = _consulta_selecao(termo, limite, engine.dialect.name)
+        return _ler_em_cache(stmt, lambda conn: [(linha.id, _rotulo_selecao(linha)) for linha in conn.execute(stmt)])
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao buscar fichas: {str(e)}")
+        return []
+
+# Busca textual: no máximo este número de palavras do termo entra na consulta
+MAXIMO_PALAVRAS_BUSCA = 8
+# Só as fichas mais recentes que casam com o termo são ordenadas por relevância: em termos amplos
+# (ex.: "ponte"), calcular a relevância de todas as ocorrências custaria mais que a própria busca
+LIMITE_CANDIDATOS_BUSCA = 2000
+
+def _palavras_busca(termo):
+    """Palavras do termo (letras e dígitos): a consulta é montada só com elas, sem sintaxe do usuário"""
+    return re.findall(r'\w+', (termo or '').lower())[:MAXIMO_PALAVRAS_BUSCA]
+
+def _sem_plural(palavra):
+    return palavra[:-1] if len(palavra) > 4 and palavra.endswith('s') else palavra
+
+def _consulta_busca_textual(termo, palavras, dialeto, colunas, filtros=None):
+    """SELECT das fichas que casam com o termo (e os filtros) e sua relevância (maior = melhor)"""
+    fichas_table = get_fichas_table()
+    selecionadas = _colunas_selecionadas(colunas)
+    
+    if dialeto == 'postgresql':
+        # Todas as palavras, cada uma como prefixo do termo já reduzido ao radical ("viadutos" casa "viaduto")
+        documento = literal_column(DOCUMENTO_BUSCA_POSTGRES)
+        consulta = func.to_tsquery(literal_column("'portuguese'::regconfig"), " & ".join(f"{p}:*" for p in palavras))
+        condicao = documento.op('@@', is_comparison=True)(consulta)
+        relevancia = func.ts_rank(documento, consulta)
+        termo = termo.strip()
+        if len(termo) >= MINIMO_BUSCA_TRIGRAMA:
+            # Trechos de código ("E-12" dentro de "OAE-123") pelos índices de trigramas; contam mais que o texto
+            padrao = f"%{_escapar_like(termo)}%"
+            trecho_codigo = or_(fichas_table.c.codigo.ilike(padrao), fichas_table.c.codigo_artesp.ilike(padrao))
+            condicao = or_(condicao, trecho_codigo)
+            relevancia = relevancia + case((trecho_codigo, 1.0), else_=0.0)
+        
+        candidatos = _aplicar_filtros(select(fichas_table.c.id).where(condicao), filtros).order_by(
+            fichas_table.c.id.desc()
+        ).limit(LIMITE_CANDIDATOS_BUSCA)
+        return select(*selecionadas, relevancia.label('relevancia')).where(fichas_table.c.id.in_(candidatos))
+    
+    # SQLite (FTS5, sem stemming): prefixo de cada palavra no singular ("viadutos" casa "viaduto");
+    # bm25 é menor para os melhores resultados
+    busca = table(TABELA_BUSCA_SQLITE, column('rowid'))
+    tabela_busca = literal_column(TABELA_BUSCA_SQLITE)
+    consulta = " ".join(f'"{_sem_plural(p)}"*' for p in palavras)
+    condicao = tabela_busca.op('MATCH', is_comparison=True)(consulta)
+    juncao = fichas_table.join(busca, busca.c.rowid == fichas_table.c.id)
+    
+    # A faixa de rowid vai para dentro da tabela FTS5, que só calcula o bm25 dos candidatos
+    candidatos = _aplicar_filtros(select(busca.c.rowid).select_from(juncao).where(condicao), filtros).order_by(
+        busca.c.rowid.desc()
+    ).limit(LIMITE_CANDIDATOS_BUSCA).subquery()
+    primeiro_candidato = select(func.min(candidatos.c.rowid)).scalar_subquery()
+    # Pesos por coluna (obra, tipo_pav, codigo, codigo_artesp): acertos nos códigos valem mais
+    relevancia = -func.bm25(tabela_busca, 1.0, 0.5, 4.0, 4.0)
+    return _aplicar_filtros(
+        select(*selecionadas, relevancia.label('relevancia')).select_from(juncao)
+        .where(condicao, busca.c.rowid >= primeiro_candidato),
+        filtros
+    )
+
+def buscar_fichas(termo, pagina=1, tamanho_pagina=TAMANHO_PAGINA_PADRAO, colunas=None, filtros=None):
+    """Busca textual em obra, tipo_pav, codigo e codigo_artesp, dos resultados mais relevantes aos menos
+    
+    PostgreSQL: tsvector com stemming em português (índice GIN) e trechos de código por trigramas;
+    SQLite: tabela FTS5. A relevância ordena as LIMITE_CANDIDATOS_BUSCA ocorrências mais recentes;
+    termos mais amplos pedem uma busca mais específica ou filtros. Páginas começam em 1.
+    Retorna {'dados': DataFrame com a coluna 'relevancia', 'pagina': int, 'tem_proxima': bool}.
+    """
+    resultado_vazio = {'dados': pd.DataFrame(), 'pagina': pagina, 'tem_proxima': False}
+    try:
+        palavras = _palavras_busca(termo)
+        if not palavras or not garantir_schema():
+            return resultado_vazio
+        
+        engine = get_db_engine()
+        if engine is None:
+            return resultado_vazio
+        
+        fichas_table = get_fichas_table()
+        stmt = _consulta_busca_textual(termo, palavras, engine.dialect.name, colunas, filtros)
+        # Uma linha a mais indica se existe próxima página
+        stmt = (
+            stmt.order_by(literal_column('relevancia').desc(), fichas_table.c.id.desc())
+            .limit(tamanho_pagina + 1)
+            .offset((max(pagina, 1) - 1) * tamanho_pagina)
+        )
+        df = _ler_em_cache(stmt, lambda conn: pd.read_sql(stmt, conn), engine.dialect.name)
+        
+        return {
+            'dados': df.iloc[:tamanho_pagina],
+            'pagina': pagina,
+            'tem_proxima': len(df) > tamanho_pagina,
+        }
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro na busca de fichas: {str(e)}")
+        return resultado_vazio
+
 def obter_registro_por_id(registro_id):
     """Obtém um registro específico por ID"""
     try:
@@ -83,72 +640,247 @@ def obter_registro_por_id(registro_id):
         if engine is None:
             st.error("Conexão com banco não disponível")
             return None
-
-        with engine.connect() as conn:
+        
+        with conexao_banco() as conn:
             query = text("SELECT * FROM fichas_inspecao WHERE id = :id")
             df = pd.read_sql(query, conn, params={"id": registro_id})
-
+            
             if not df.empty:
                 return df.iloc[0].to_dict()
             return None
-
+    
     except Exception as e:
+        invalidar_schema_se_necessario(e)
         st.error(f"Erro ao obter registro: {str(e)}")
         return None
 
-def atualizar_registro(registro_id, dados):
-    """Atualiza um registro específico"""
+def _resolver_alvo(conn, alvo, colunas):
+    """Fichas-alvo de uma operação em lote (lista de ids ou filtros), travadas até o fim da transação"""
+    fichas_table = get_fichas_table()
+    if isinstance(alvo, dict):
+        condicoes = construir_condicoes_filtro(alvo)
+        if not condicoes:
+            raise ValueError("Filtro vazio: informe ids ou ao menos um filtro")
+    else:
+        condicoes = [fichas_table.c.id.in_([int(_valor_sql(registro_id)) for registro_id in alvo])]
+    
+    stmt = (
+        select(*[fichas_table.c[coluna] for coluna in colunas])
+        .where(*condicoes)
+        .order_by(fichas_table.c.id)
+        .with_for_update()
+    )
+    return [dict(linha) for linha in conn.execute(stmt).mappings()]
+
+def _resultados_nao_encontrados(alvo, encontrados):
+    if isinstance(alvo, dict):
+        return {}
+    return {
+        int(_valor_sql(registro_id)): {'status': 'nao_encontrado', 'mensagem': "Ficha não encontrada"}
+        for registro_id in alvo if int(_valor_sql(registro_id)) not in encontrados
+    }
+
+def _marcar_conflitos_com_mantidas(anteriores, novas, conflitos, restricoes):
+    """Fichas em conflito não são alteradas e suas chaves atuais seguem ocupadas: outra ficha do lote
+    não pode assumi-las. Repete até nenhuma nova ficha sair do lote."""
+    while True:
+        ocupadas = {nome: set() for nome in restricoes}
+        for anterior, violadas in zip(anteriores, conflitos):
+            if violadas:
+                for nome in restricoes:
+                    chave = _chave_restricao(anterior, RESTRICOES_UNICAS[nome])
+                    if chave:
+                        ocupadas[nome].add(chave)
+        
+        novos_conflitos = False
+        for nova, violadas in zip(novas, conflitos):
+            if violadas:
+                continue
+            for nome in restricoes:
+                chave = _chave_restricao(nova, RESTRICOES_UNICAS[nome])
+                if chave and chave in ocupadas[nome]:
+                    violadas.append(nome)
+                    novos_conflitos = True
+        if not novos_conflitos:
+            return
+
+def atualizar_fichas_lote(alvo, dados):
+    """Aplica os mesmos valores a várias fichas (lista de ids ou filtros) com um único UPDATE, em uma transação
+    
+    A unicidade é verificada para o conjunto: contra as demais fichas do banco e entre as próprias fichas
+    do lote. As que violariam uma restrição ficam de fora (status 'conflito') e as demais são atualizadas.
+    Retorna {'atualizados', 'conflitos', 'nao_encontrados', 'resultados': {id: {'status', 'mensagem'}}},
+    ou None em caso de erro.
+    """
     try:
-        engine = get_db_engine()
+        if not garantir_schema():
+            return None
+        
         fichas_table = get_fichas_table()
+        dados = _com_km_m({campo: _valor_sql(valor) for campo, valor in dados.items()})
+        desconhecidas = [campo for campo in dados if campo not in fichas_table.c or campo == 'id']
+        if desconhecidas:
+            raise ValueError(f"Colunas não atualizáveis: {', '.join(desconhecidas)}")
         
-        # Verificar se a atualização não criará duplicata
-        if dados.get('codigo'):
-            with engine.connect() as conn:
-                query = text("""
-                    SELECT COUNT(*) FROM fichas_inspecao 
-                    WHERE codigo = :codigo AND id != :id
-                """)
-                result = conn.execute(query, {'codigo': dados['codigo'], 'id': registro_id})
-                if result.scalar() > 0:
-                    st.error("❌ Já existe outra ficha com este código")
-                    return False
-        
-        with engine.begin() as conn:
-            stmt = fichas_table.update().where(fichas_table.c.id == registro_id).values(**dados)
-            result = conn.execute(stmt)
+        restricoes = [nome for nome, colunas in RESTRICOES_UNICAS.items() if set(colunas) & set(dados)]
+        colunas = sorted(
+            {'id'} | set(COLUNAS_ROLLUP_FICHA) | {coluna for nome in restricoes for coluna in RESTRICOES_UNICAS[nome]}
+        )
+        
+        with conexao_banco(transacao=True) as conn:
+            anteriores = _resolver_alvo(conn, alvo, colunas)
+            novas = [{**anterior, **dados} for anterior in anteriores]
             
-            if result.rowcount > 0:
-                st.success("✅ Registro atualizado com sucesso!")
-                return True
+            conflitos = [[] for _ in novas]
+            if restricoes and novas:
+                conflitos = verificar_duplicatas_lote(novas, conn, restricoes, ignorar_ids=[f['id'] for f in anteriores])
+                if conflitos is None:
+                    return None
+                _marcar_conflitos_com_mantidas(anteriores, novas, conflitos, restricoes)
+            
+            aplicar = [indice for indice, violadas in enumerate(conflitos) if not violadas]
+            if aplicar:
+                conn.execute(
+                    fichas_table.update()
+                    .where(fichas_table.c.id.in_([anteriores[indice]['id'] for indice in aplicar]))
+                    .values(**dados)
+                )
+                aplicar_delta(conn, calcular_delta(
+                    [anteriores[indice] for indice in aplicar], [novas[indice] for indice in aplicar]
+                ))
+                query_cache.registrar_escrita(conn)
+        
+        if aplicar:
+            _invalidar_caches_leitura()
+        
+        resultados = _resultados_nao_encontrados(alvo, {anterior['id'] for anterior in anteriores})
+        for anterior, violadas in zip(anteriores, conflitos):
+            if violadas:
+                resultados[anterior['id']] = {'status': 'conflito', 'mensagem': f"Ficha já existe ({', '.join(violadas)})"}
             else:
-                st.warning("⚠️ Nenhum registro foi atualizado")
-                return False
-                
+                resultados[anterior['id']] = {'status': 'atualizado', 'mensagem': None}
+        
+        status = [resultado['status'] for resultado in resultados.values()]
+        return {
+            'atualizados': status.count('atualizado'),
+            'conflitos': status.count('conflito'),
+            'nao_encontrados': status.count('nao_encontrado'),
+            'resultados': resultados,
+        }
+    
+    except Exception as e:
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao atualizar fichas em lote: {str(e)}")
+        return None
+
+def deletar_fichas_lote(alvo):
+    """Remove várias fichas (lista de ids ou filtros, nunca vazio) com um único DELETE, em uma transação
+    
+    Retorna {'deletados', 'nao_encontrados', 'resultados': {id: {'status', 'mensagem'}}}, ou None em caso de erro.
+    """
+    try:
+        if not garantir_schema():
+            return None
+        
+        fichas_table = get_fichas_table()
+        with conexao_banco(transacao=True) as conn:
+            anteriores = _resolver_alvo(conn, alvo, ['id'] + COLUNAS_ROLLUP_FICHA)
+            if anteriores:
+                conn.execute(fichas_table.delete().where(fichas_table.c.id.in_([f['id'] for f in anteriores])))
+                aplicar_delta(conn, calcular_delta(fichas_removidas=anteriores))
+                query_cache.registrar_escrita(conn)
+        
+        if anteriores:
+            _invalidar_caches_leitura()
+        
+        resultados = _resultados_nao_encontrados(alvo, {anterior['id'] for anterior in anteriores})
+        for anterior in anteriores:
+            resultados[anterior['id']] = {'status': 'deletado', 'mensagem': None}
+        
+        return {
+            'deletados': len(anteriores),
+            'nao_encontrados': len(resultados) - len(anteriores),
+            'resultados': resultados,
+        }
+    
     except Exception as e:
-        st.error(f"Erro ao atualizar: {str(e)}")
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao deletar fichas em lote: {str(e)}")
+        return None
+
+def atualizar_registro(registro_id, dados):
+    """Atualiza um registro específico"""
+    resultado = atualizar_fichas_lote([registro_id], dados)
+    if resultado is None:
         return False
+    
+    situacao = resultado['resultados'][int(_valor_sql(registro_id))]
+    if situacao['status'] == 'atualizado':
+        st.success("✅ Registro atualizado com sucesso!")
+        return True
+    if situacao['status'] == 'conflito':
+        st.error(f"❌ Já existe outra ficha com estes dados: {situacao['mensagem']}")
+        return False
+    st.warning("⚠️ Nenhum registro foi atualizado")
+    return False
 
-def deletar_registro(registro_id):
-    """Deleta um registro específico"""
+def atualizar_fichas_por_arquivo_s3(dados_lista, campos):
+    """Atualiza em lote (um único executemany) as fichas identificadas por arquivo_s3
+    
+    Retorna o número de linhas atualizadas, ou None em caso de erro.
+    """
     try:
+        if not dados_lista:
+            return 0
+        
+        if not garantir_schema():
+            return None
+        
         engine = get_db_engine()
+        if engine is None:
+            st.error("Conexão com banco não disponível")
+            return None
+        
+        if 'km' in campos:
+            campos = list(campos) + ['km_m']
+            dados_lista = [_com_km_m(dados) for dados in dados_lista]
+        
         fichas_table = get_fichas_table()
+        stmt = (
+            fichas_table.update()
+            .where(fichas_table.c.arquivo_s3 == bindparam('chave_arquivo_s3'))
+            .values({campo: bindparam(f'novo_{campo}') for campo in campos})
+        )
+        parametros = [
+            {'chave_arquivo_s3': dados['arquivo_s3'], **{f'novo_{campo}': dados.get(campo) for campo in campos}}
+            for dados in dados_lista
+        ]
         
-        with engine.begin() as conn:
-            stmt = fichas_table.delete().where(fichas_table.c.id == registro_id)
-            result = conn.execute(stmt)
-            
-            if result.rowcount > 0:
-                st.success("✅ Registro deletado com sucesso!")
-                return True
-            else:
-                st.warning("⚠️ Nenhum registro foi deletado")
-                return False
-                
+        with conexao_banco(transacao=True) as conn:
+            condicao = fichas_table.c.arquivo_s3.in_([dados['arquivo_s3'] for dados in dados_lista])
+            anterior = ler_estado_rollup(conn, condicao, bloquear=True)
+            linhas_afetadas = conn.execute(stmt, parametros).rowcount
+            aplicar_delta(conn, calcular_delta(anterior, ler_estado_rollup(conn, condicao)))
+            query_cache.registrar_escrita(conn)
+        _invalidar_caches_leitura()
+        return linhas_afetadas
+    
     except Exception as e:
-        st.error(f"Erro ao deletar: {str(e)}")
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao atualizar fichas em lote: {str(e)}")
+        return None
+
+def deletar_registro(registro_id):
+    """Deleta um registro específico"""
+    resultado = deletar_fichas_lote([registro_id])
+    if resultado is None:
         return False
+    
+    if resultado['deletados'] > 0:
+        st.success("✅ Registro deletado com sucesso!")
+        return True
+    st.warning("⚠️ Nenhum registro foi deletado")
+    return False
 
 def criar_novo_registro(dados):
     """Cria um novo registro com verificação de duplicata"""
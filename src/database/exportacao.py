@@ -0,0 +1,158 @@
+import io
+import os
+import csv
+import sys
+import argparse
+import datetime
+import tempfile
+from sqlalchemy import select, Integer, Date, DateTime
+from utils.config import conexao_banco
+from src.database.models import get_fichas_table, garantir_schema
+
+# Linhas por ida ao cursor do servidor: a memória da exportação fica limitada a um lote
+TAMANHO_LOTE_EXPORTACAO = 5000
+
+FORMATOS_EXPORTACAO = {
+    'csv': {'extensao': 'csv', 'mime': 'text/csv'},
+    'xlsx': {'extensao': 'xlsx', 'mime': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'parquet': {'extensao': 'parquet', 'mime': 'application/vnd.apache.parquet'},
+}
+
+def formatos_disponiveis():
+    """Formatos suportados no ambiente (Parquet requer o pacote opcional pyarrow)"""
+    formatos = ['csv', 'xlsx']
+    try:
+        import pyarrow  # noqa: F401
+        formatos.append('parquet')
+    except ImportError:
+        pass
+    return formatos
+
+def _lotes_registros(filtros=None, colunas=None):
+    """Gera lotes de tuplas a partir de um cursor do servidor, na ordem da listagem"""
+    from src.database.crud_operations import _aplicar_filtros, _colunas_selecionadas, _ordenacao_listagem
+    
+    stmt = (
+        _aplicar_filtros(select(*_colunas_selecionadas(colunas)), filtros)
+        .order_by(*_ordenacao_listagem())
+        .execution_options(yield_per=TAMANHO_LOTE_EXPORTACAO)
+    )
+    with conexao_banco() as conn:
+        yield from conn.execute(stmt).partitions()
+
+def _escrever_csv(lotes, destino, colunas):
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline='')
+    escritor = csv.writer(texto)
+    escritor.writerow(colunas)
+    linhas = 0
+    for lote in lotes:
+        escritor.writerows(lote)
+        linhas += len(lote)
+    texto.flush()
+    texto.detach()
+    return linhas
+
+def _escrever_xlsx(lotes, destino, colunas):
+    from openpyxl import Workbook
+    
+    # write_only: cada linha vai direto para o XML temporário da planilha, sem manter células em memória
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Fichas_Inspecao')
+    ws.append(colunas)
+    linhas = 0
+    for lote in lotes:
+        for linha in lote:
+            ws.append(list(linha))
+        linhas += len(lote)
+    wb.save(destino)
+    return linhas
+
+def _schema_parquet(colunas):
+    import pyarrow as pa
+    
+    fichas_table = get_fichas_table()
+    tipos = []
+    for nome in colunas:
+        tipo = fichas_table.c[nome].type
+        if isinstance(tipo, Integer):
+            tipos.append(pa.field(nome, pa.int64()))
+        elif isinstance(tipo, DateTime):
+            tipos.append(pa.field(nome, pa.timestamp('us')))
+        elif isinstance(tipo, Date):
+            tipos.append(pa.field(nome, pa.date32()))
+        else:
+            tipos.append(pa.field(nome, pa.string()))
+    return pa.schema(tipos)
+
+def _escrever_parquet(lotes, destino, colunas):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    schema = _schema_parquet(colunas)
+    linhas = 0
+    # Um row group por lote: o escritor não acumula o arquivo em memória
+    with pq.ParquetWriter(destino, schema, compression='snappy') as escritor:
+        for lote in lotes:
+            valores = list(zip(*lote))
+            escritor.write_batch(pa.record_batch(
+                [pa.array(coluna, type=campo.type) for coluna, campo in zip(valores, schema)], schema=schema
+            ))
+            linhas += len(lote)
+    return linhas
+
+def exportar_registros(formato, destino, filtros=None, colunas=None):
+    """Escreve as fichas filtradas em `destino` (arquivo binário) no formato pedido; retorna o nº de linhas"""
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    if not garantir_schema():
+        raise RuntimeError("Banco de dados indisponível")
+    
+    colunas = list(colunas) if colunas else [coluna.name for coluna in get_fichas_table().columns]
+    lotes = _lotes_registros(filtros, colunas)
+    if formato == 'csv':
+        return _escrever_csv(lotes, destino, colunas)
+    if formato == 'xlsx':
+        return _escrever_xlsx(lotes, destino, colunas)
+    return _escrever_parquet(lotes, destino, colunas)
+
+def gerar_exportacao(formato, filtros=None, colunas=None):
+    """Gera a exportação em um arquivo temporário em disco
+    
+    Retorna {'caminho', 'nome_arquivo', 'mime', 'linhas', 'tamanho'}; quem chama remove o arquivo.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+    config = FORMATOS_EXPORTACAO[formato]
+    descritor, caminho = tempfile.mkstemp(prefix='fichas_exportacao_', suffix=f".{config['extensao']}")
+    try:
+        with os.fdopen(descritor, 'wb') as destino:
+            linhas = exportar_registros(formato, destino, filtros, colunas)
+    except Exception:
+        os.remove(caminho)
+        raise
+    
+    return {
+        'caminho': caminho,
+        'nome_arquivo': f"fichas_inspecao_{datetime.date.today()}.{config['extensao']}",
+        'mime': config['mime'],
+        'linhas': linhas,
+        'tamanho': os.path.getsize(caminho),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta as fichas do banco em CSV, XLSX ou Parquet")
+    parser.add_argument('saida', help="Arquivo de saída")
+    parser.add_argument('--formato', choices=list(FORMATOS_EXPORTACAO), help="Padrão: pela extensão da saída")
+    parser.add_argument('--concessionaria')
+    parser.add_argument('--rodovia')
+    parser.add_argument('--ano', type=int)
+    args = parser.parse_args()
+    
+    formato = args.formato or os.path.splitext(args.saida)[1].lstrip('.').lower()
+    filtros = {'concessionaria': args.concessionaria, 'rodovia': args.rodovia, 'ano_inspecao': args.ano}
+    with open(args.saida, 'wb') as destino:
+        linhas = exportar_registros(formato, destino, filtros)
+    print(f"{linhas} ficha(s) exportada(s) para {args.saida}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
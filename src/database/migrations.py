@@ -0,0 +1,521 @@
+import re
+import sys
+import json
+import argparse
+import datetime
+import pandas as pd
+from sqlalchemy import text, select, insert, update, inspect, bindparam, or_
+from sqlalchemy.exc import IntegrityError
+from utils.config import get_db_engine
+from src.database.models import (
+    get_fichas_table, get_rollup_table, get_migracoes_table, get_versao_dados_table, RESTRICOES_UNICAS,
+    COLUNAS_BUSCA_TEXTUAL, DOCUMENTO_BUSCA_POSTGRES, TABELA_BUSCA_SQLITE
+)
+from src.database import query_cache
+
+# Chave do advisory lock do PostgreSQL: só um processo migra por vez; os demais seguem sem esperar
+CHAVE_TRAVA_MIGRACOES = 7_340_517
+
+# Índices das consultas quentes: colunas por dialeto ('padrao' vale para os demais)
+INDICES_CONSULTAS = {
+    # Listagens paginadas por chave: ORDER BY data_upload DESC NULLS LAST, id DESC
+    # (no SQLite um índice DESC já deixa os nulos no fim e NULLS LAST não é aceito em índices)
+    'ix_fichas_listagem': {
+        'postgresql': '(data_upload DESC NULLS LAST, id DESC)',
+        'padrao': '(data_upload DESC, id DESC)',
+    },
+    # Dashboard: filtro por ano e classificações (GROUP BY quando a seleção é parcial)
+    'ix_fichas_ano_classificacoes': {'padrao': '(ano_inspecao, estrutural, funcional, durabilidade)'},
+    # CRUD: filtro por concessionária/rodovia já na ordem da listagem
+    'ix_fichas_concessionaria_rodovia': {
+        'postgresql': '(concessionaria, rodovia, data_upload DESC NULLS LAST, id DESC)',
+        'padrao': '(concessionaria, rodovia, data_upload DESC, id DESC)',
+    },
+    'ix_fichas_rodovia': {'padrao': '(rodovia)'},
+}
+
+# Consultas por trecho: rodovia + faixa de km_m, com ou sem sentido, em ordem de km
+INDICES_TRECHO = {
+    'ix_fichas_rodovia_sentido_km': {'padrao': '(rodovia, sentido, km_m)'},
+    'ix_fichas_rodovia_km': {'padrao': '(rodovia, km_m)'},
+}
+
+# Busca do seletor de fichas (CRUD): trigramas no PostgreSQL (ILIKE '%termo%'), prefixo sem distinção
+# de maiúsculas no SQLite (o LIKE só usa índice com COLLATE NOCASE)
+INDICES_BUSCA_SELECAO = {
+    f'ix_fichas_{coluna}_busca': {
+        'postgresql': f'USING gin ({coluna} gin_trgm_ops)',
+        'padrao': f'({coluna} COLLATE NOCASE)',
+    }
+    for coluna in ('codigo', 'obra', 'concessionaria')
+}
+
+# Busca textual no PostgreSQL: documento com stemming em português e trechos de códigos por trigramas
+# (codigo já tem o índice de trigramas do seletor). No SQLite a busca usa a tabela FTS5
+INDICES_BUSCA_TEXTUAL = {
+    'ix_fichas_busca_texto': {'postgresql': f'USING gin (({DOCUMENTO_BUSCA_POSTGRES}))'},
+    'ix_fichas_codigo_artesp_busca': {'postgresql': 'USING gin (codigo_artesp gin_trgm_ops)'},
+}
+
+# Fichas por lote (e por commit) no preenchimento de km_m
+TAMANHO_LOTE_KM = 5000
+
+# Números inteiros lidos como float ('3.0'): a leitura das fichas grava '3' (ver normalizar_valor_celula)
+_RE_INTEIRO_COM_PONTO_ZERO = re.compile(r'^\s*(-?\d+)\.0\s*$')
+
+def _conexao_autocommit(engine):
+    """CREATE INDEX CONCURRENTLY não roda dentro de transação"""
+    return engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+
+def criar_indice(nome, tabela='fichas_inspecao', colunas_por_dialeto=None):
+    """Passo de migração: cria o índice sem bloquear escritas (CONCURRENTLY no PostgreSQL)
+    
+    Sem 'padrao', o índice só é criado nos dialetos listados.
+    """
+    colunas_por_dialeto = colunas_por_dialeto or INDICES_CONSULTAS[nome]
+    
+    def passo(engine):
+        dialeto = engine.dialect.name
+        colunas = colunas_por_dialeto.get(dialeto, colunas_por_dialeto.get('padrao'))
+        if colunas is None:
+            return
+        
+        with _conexao_autocommit(engine) as conn:
+            if dialeto == 'postgresql':
+                # Um CONCURRENTLY interrompido deixa o índice INVALID; IF NOT EXISTS o manteria assim
+                invalido = conn.execute(text(
+                    "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :nome AND NOT i.indisvalid"
+                ), {'nome': nome}).scalar()
+                if invalido:
+                    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {nome}"))
+                conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {nome} ON {tabela} {colunas}"))
+            else:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {nome} ON {tabela} {colunas}"))
+    
+    passo.descricao = f"índice {nome}"
+    return passo
+
+def remover_indice(nome):
+    """Passo de migração: remove um índice que outro passou a cobrir (CONCURRENTLY no PostgreSQL)"""
+    def passo(engine):
+        with _conexao_autocommit(engine) as conn:
+            concorrente = "CONCURRENTLY " if engine.dialect.name == 'postgresql' else ""
+            conn.execute(text(f"DROP INDEX {concorrente}IF EXISTS {nome}"))
+    
+    passo.descricao = f"remoção do índice {nome}"
+    return passo
+
+def extensao_disponivel(conn, nome):
+    return conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = :nome"), {'nome': nome}).scalar() is not None
+
+def habilitar_extensao(nome):
+    """Passo de migração: CREATE EXTENSION no PostgreSQL
+    
+    Sem permissão para criar a extensão, o passo só avisa: os índices que dependem dela são pulados
+    e as consultas continuam funcionando, sem índice.
+    """
+    def passo(engine):
+        if engine.dialect.name != 'postgresql':
+            return
+        with _conexao_autocommit(engine) as conn:
+            try:
+                conn.execute(text(f"CREATE EXTENSION IF NOT EXISTS {nome}"))
+            except Exception as e:
+                print(f"Extensão {nome} indisponível ({e}); índices que dependem dela não serão criados",
+                      file=sys.stderr)
+    
+    passo.descricao = f"extensão {nome}"
+    return passo
+
+def criar_indice_com_extensao(nome, extensao, colunas_por_dialeto):
+    """criar_indice que, no PostgreSQL, só roda se a extensão estiver instalada"""
+    criar = criar_indice(nome, colunas_por_dialeto=colunas_por_dialeto)
+    
+    def passo(engine):
+        if engine.dialect.name == 'postgresql':
+            with engine.connect() as conn:
+                if not extensao_disponivel(conn, extensao):
+                    return
+        criar(engine)
+    
+    passo.descricao = criar.descricao
+    return passo
+
+def adicionar_coluna(tabela, coluna, tipo_sql):
+    """Passo de migração: adiciona uma coluna anulável (sem reescrever a tabela) se ainda não existir"""
+    def passo(engine):
+        with _conexao_autocommit(engine) as conn:
+            if engine.dialect.name == 'postgresql':
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS {coluna} {tipo_sql}"))
+            elif coluna not in {c['name'] for c in inspect(conn).get_columns(tabela)}:
+                conn.execute(text(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo_sql}"))
+    
+    passo.descricao = f"coluna {tabela}.{coluna}"
+    return passo
+
+def _criar_rollup(engine):
+    """Bancos anteriores ao rollup: cria a tabela e a popula a partir das fichas já gravadas"""
+    from src.database.rollup import reconstruir_rollup
+    
+    if not inspect(engine).has_table(get_rollup_table().name):
+        get_rollup_table().create(engine, checkfirst=True)
+        with engine.begin() as conn:
+            reconstruir_rollup(conn)
+        query_cache.incrementar_versao(query_cache.TABELA_ROLLUP)
+
+_criar_rollup.descricao = "tabela fichas_rollup_classificacao"
+
+def _preencher_km_m(engine):
+    """Backfill de km_m a partir do km já gravado, em lotes por id com um commit cada"""
+    from src.processing.batch_normalizer import km_em_metros
+    
+    fichas_table = get_fichas_table()
+    stmt = (
+        update(fichas_table)
+        .where(fichas_table.c.id == bindparam('chave_id'))
+        .values(km_m=bindparam('novo_km_m'))
+    )
+    
+    ultimo_id = 0
+    while True:
+        with engine.begin() as conn:
+            lote = conn.execute(
+                select(fichas_table.c.id, fichas_table.c.km)
+                .where(fichas_table.c.km_m.is_(None), fichas_table.c.km.isnot(None), fichas_table.c.id > ultimo_id)
+                .order_by(fichas_table.c.id)
+                .limit(TAMANHO_LOTE_KM)
+            ).fetchall()
+            if not lote:
+                break
+            
+            metros = km_em_metros(pd.Series([linha.km for linha in lote]))
+            parametros = [
+                {'chave_id': linha.id, 'novo_km_m': int(valor)}
+                for linha, valor in zip(lote, metros) if not pd.isna(valor)
+            ]
+            if parametros:
+                conn.execute(stmt, parametros)
+            ultimo_id = lote[-1].id
+    
+    query_cache.incrementar_versao(query_cache.TABELA_FICHAS)
+
+_preencher_km_m.descricao = "preenchimento de fichas_inspecao.km_m"
+
+def _criar_busca_fts5(engine):
+    """SQLite: índice FTS5 de conteúdo externo sobre fichas_inspecao, sincronizado por triggers"""
+    if engine.dialect.name != 'sqlite':
+        return
+    
+    colunas = ", ".join(COLUNAS_BUSCA_TEXTUAL)
+    novas = ", ".join(f"new.{coluna}" for coluna in COLUNAS_BUSCA_TEXTUAL)
+    antigas = ", ".join(f"old.{coluna}" for coluna in COLUNAS_BUSCA_TEXTUAL)
+    inserir = f"INSERT INTO {TABELA_BUSCA_SQLITE} (rowid, {colunas}) VALUES (new.id, {novas});"
+    remover = (f"INSERT INTO {TABELA_BUSCA_SQLITE} ({TABELA_BUSCA_SQLITE}, rowid, {colunas}) "
+               f"VALUES ('delete', old.id, {antigas});")
+    
+    with engine.begin() as conn:
+        # remove_diacritics: "inspeção" e "inspecao" casam
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_BUSCA_SQLITE} USING fts5({colunas}, "
+            f"content='fichas_inspecao', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA_SQLITE}_ai AFTER INSERT ON fichas_inspecao BEGIN {inserir} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA_SQLITE}_ad AFTER DELETE ON fichas_inspecao BEGIN {remover} END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER IF NOT EXISTS {TABELA_BUSCA_SQLITE}_au AFTER UPDATE OF {colunas} ON fichas_inspecao "
+            f"BEGIN {remover} {inserir} END"
+        ))
+        # Indexa as fichas já gravadas
+        conn.execute(text(f"INSERT INTO {TABELA_BUSCA_SQLITE} ({TABELA_BUSCA_SQLITE}) VALUES ('rebuild')"))
+
+_criar_busca_fts5.descricao = f"tabela FTS5 {TABELA_BUSCA_SQLITE} (SQLite)"
+
+def _criar_versao_dados(engine):
+    """Contador de escritas que carimba o cache de consultas (linha única, id = 1)"""
+    versao_dados_table = get_versao_dados_table()
+    versao_dados_table.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(select(versao_dados_table.c.id)).first() is None:
+            conn.execute(insert(versao_dados_table).values(id=1, versao=0))
+
+_criar_versao_dados.descricao = "tabela fichas_versao_dados"
+
+def _normalizar_inteiros_texto(engine):
+    """Reescreve '3.0' como '3' nas colunas de texto lidas das células, como a leitura atual grava
+    
+    Em lotes por id com um commit cada. Se a reescrita violaria uma restrição única (a mesma ficha já
+    gravada nos dois formatos), só as colunas fora das restrições são reescritas. Ao final o rollup é
+    recalculado.
+    """
+    from src.database.rollup import reconstruir_rollup
+    from src.processing.cell_templates import TIPOS_CAMPOS
+    
+    fichas_table = get_fichas_table()
+    colunas_restricoes = {coluna for colunas in RESTRICOES_UNICAS.values() for coluna in colunas}
+    colunas = [fichas_table.c[campo] for campo, tipo in TIPOS_CAMPOS.items() if tipo in ('texto', 'km', 'classificacao')]
+    
+    ultimo_id = 0
+    mantidas = 0
+    while True:
+        with engine.begin() as conn:
+            lote = conn.execute(
+                select(fichas_table.c.id, *colunas)
+                .where(or_(*[coluna.like('%.0') for coluna in colunas]), fichas_table.c.id > ultimo_id)
+                .order_by(fichas_table.c.id)
+                .limit(TAMANHO_LOTE_KM)
+            ).mappings().fetchall()
+            if not lote:
+                break
+            
+            for linha in lote:
+                novos = {}
+                for coluna in colunas:
+                    inteiro = _RE_INTEIRO_COM_PONTO_ZERO.match(linha[coluna.name] or '')
+                    if inteiro:
+                        novos[coluna.name] = inteiro[1]
+                if not novos:
+                    continue
+                try:
+                    with conn.begin_nested():
+                        conn.execute(update(fichas_table).where(fichas_table.c.id == linha['id']).values(**novos))
+                except IntegrityError:
+                    mantidas += 1
+                    livres = {coluna: valor for coluna, valor in novos.items() if coluna not in colunas_restricoes}
+                    if livres:
+                        conn.execute(update(fichas_table).where(fichas_table.c.id == linha['id']).values(**livres))
+            ultimo_id = lote[-1]['id']
+    
+    with engine.begin() as conn:
+        reconstruir_rollup(conn)
+        query_cache.registrar_escrita(conn)
+    query_cache.incrementar_versao(query_cache.TABELA_FICHAS, query_cache.TABELA_ROLLUP)
+    if mantidas:
+        print(f"{mantidas} ficha(s) com chave mantida com '.0': já existe a mesma ficha no formato novo",
+              file=sys.stderr)
+
+_normalizar_inteiros_texto.descricao = "números inteiros sem '.0' nas colunas de texto"
+
+# Migrações em ordem; cada passo é idempotente (pode ser reaplicado após uma falha no meio)
+MIGRACOES = [
+    {
+        'versao': 1,
+        'descricao': "Contagens pré-agregadas do dashboard",
+        'passos': [_criar_rollup],
+    },
+    {
+        'versao': 2,
+        'descricao': "Índices de listagem, filtros do CRUD e dashboard",
+        'passos': [criar_indice(nome) for nome in INDICES_CONSULTAS],
+    },
+    {
+        'versao': 3,
+        'descricao': "km numérico (metros) e índices de consulta por trecho",
+        'passos': [adicionar_coluna('fichas_inspecao', 'km_m', 'INTEGER'), _preencher_km_m] + [
+            criar_indice(nome, colunas_por_dialeto=colunas) for nome, colunas in INDICES_TRECHO.items()
+        ] + [
+            # (rodovia, km_m) atende as mesmas consultas (DISTINCT e filtro por rodovia)
+            remover_indice('ix_fichas_rodovia'),
+        ],
+    },
+    {
+        'versao': 4,
+        'descricao': "Índices da busca do seletor de fichas (código, obra, concessionária)",
+        'passos': [habilitar_extensao('pg_trgm')] + [
+            criar_indice_com_extensao(nome, 'pg_trgm', colunas) for nome, colunas in INDICES_BUSCA_SELECAO.items()
+        ],
+    },
+    {
+        'versao': 5,
+        'descricao': "Busca textual em obra, tipo de pavimento e códigos",
+        'passos': [
+            criar_indice('ix_fichas_busca_texto', colunas_por_dialeto=INDICES_BUSCA_TEXTUAL['ix_fichas_busca_texto']),
+            criar_indice_com_extensao('ix_fichas_codigo_artesp_busca', 'pg_trgm',
+                                      INDICES_BUSCA_TEXTUAL['ix_fichas_codigo_artesp_busca']),
+            _criar_busca_fts5,
+        ],
+    },
+    {
+        'versao': 6,
+        'descricao': "Contador de escritas para o cache de consultas entre processos",
+        'passos': [_criar_versao_dados],
+    },
+    {
+        'versao': 7,
+        'descricao': "Números inteiros das células gravados sem '.0' (formato da leitura em streaming)",
+        'passos': [_normalizar_inteiros_texto],
+    },
+]
+
+def versoes_aplicadas(conn):
+    migracoes_table = get_migracoes_table()
+    return {linha[0] for linha in conn.execute(select(migracoes_table.c.versao))}
+
+def migracoes_pendentes(engine=None):
+    """Versões de MIGRACOES ainda não aplicadas no banco (todas, se a tabela de controle não existir)"""
+    engine = engine or get_db_engine()
+    with engine.connect() as conn:
+        aplicadas = versoes_aplicadas(conn) if inspect(conn).has_table(get_migracoes_table().name) else set()
+    return [migracao['versao'] for migracao in MIGRACOES if migracao['versao'] not in aplicadas]
+
+def aplicar_migracoes(engine=None, callback_progresso=None):
+    """Aplica as migrações pendentes e retorna as versões aplicadas nesta chamada
+    
+    No PostgreSQL, se outro processo já estiver migrando, retorna [] sem esperar.
+    callback_progresso(versao, descricao_do_passo) é chamado antes de cada passo.
+    """
+    engine = engine or get_db_engine()
+    migracoes_table = get_migracoes_table()
+    # Banco novo: a tabela principal nasce aqui e as migrações completam índices e tabelas auxiliares
+    get_fichas_table().create(engine, checkfirst=True)
+    migracoes_table.create(engine, checkfirst=True)
+    postgres = engine.dialect.name == 'postgresql'
+    
+    aplicadas_agora = []
+    with _conexao_autocommit(engine) as trava:
+        if postgres and not trava.execute(text("SELECT pg_try_advisory_lock(:chave)"),
+                                          {'chave': CHAVE_TRAVA_MIGRACOES}).scalar():
+            return aplicadas_agora
+        try:
+            aplicadas = versoes_aplicadas(trava)
+            for migracao in MIGRACOES:
+                if migracao['versao'] in aplicadas:
+                    continue
+                for passo in migracao['passos']:
+                    if callback_progresso:
+                        callback_progresso(migracao['versao'], passo.descricao)
+                    passo(engine)
+                with engine.begin() as conn:
+                    conn.execute(insert(migracoes_table).values(
+                        versao=migracao['versao'],
+                        descricao=migracao['descricao'],
+                        aplicada_em=datetime.datetime.now()
+                    ))
+                aplicadas_agora.append(migracao['versao'])
+        finally:
+            if postgres:
+                trava.execute(text("SELECT pg_advisory_unlock(:chave)"), {'chave': CHAVE_TRAVA_MIGRACOES})
+    
+    return aplicadas_agora
+
+def _consultas_referencia(dialeto, colunas_banco, tabelas_banco):
+    """As consultas quentes do app, montadas pelos mesmos helpers de crud_operations
+    
+    colunas_banco são as colunas de fichas_inspecao e tabelas_banco as tabelas já existentes no banco: no
+    relatório "antes" o schema pode ser o de uma versão anterior. Consultas que dependem de uma migração ainda não aplicada vêm como
+    texto ("n/a (requer vN)") em vez do statement.
+    """
+    from sqlalchemy import func, tuple_
+    from src.database.crud_operations import (
+        _aplicar_filtros, _ordenacao_listagem, _consulta_selecao, _consulta_busca_textual
+    )
+    
+    fichas_table = get_fichas_table()
+    colunas = [coluna for coluna in fichas_table.columns if coluna.name in colunas_banco]
+    ano = datetime.date.today().year
+    
+    trecho = "n/a (requer v3)"
+    if 'km_m' in colunas_banco:
+        trecho = select(*colunas).where(
+            fichas_table.c.rodovia == 'SP-330', fichas_table.c.km_m.between(100_000, 150_000)
+        ).order_by(fichas_table.c.km_m, fichas_table.c.id)
+    
+    # No SQLite a busca textual lê a tabela FTS5; no PostgreSQL sem o índice GIN ela só fica mais lenta
+    busca = "n/a (requer v5)"
+    if dialeto != 'sqlite' or TABELA_BUSCA_SQLITE in tabelas_banco:
+        busca = _consulta_busca_textual(
+            'viaduto', ['viaduto'], dialeto, [coluna.name for coluna in colunas]
+        ).limit(51)
+    
+    return {
+        'listagem (1ª página)': select(*colunas).order_by(*_ordenacao_listagem()).limit(51),
+        'listagem (página seguinte)': select(*colunas).where(
+            tuple_(fichas_table.c.data_upload, fichas_table.c.id) < tuple_(datetime.date.today(), 1_000_000)
+        ).order_by(*_ordenacao_listagem()).limit(51),
+        'crud: concessionária + rodovia': _aplicar_filtros(select(*colunas), {
+            'concessionaria': 'CCR AutoBAn', 'rodovia': 'SP-330'
+        }).order_by(*_ordenacao_listagem()).limit(51),
+        'dashboard: GROUP BY com filtro parcial': _aplicar_filtros(
+            select(fichas_table.c.estrutural, func.count()), {
+                'ano_inspecao': [ano - 1, ano], 'estrutural': ['C0', 'C1'], 'funcional': ['C0', 'C1', 'C2']
+            }
+        ).group_by(fichas_table.c.estrutural),
+        'trecho: rodovia + faixa de km': trecho,
+        'opções: DISTINCT rodovia': select(fichas_table.c.rodovia).distinct().where(
+            fichas_table.c.rodovia.isnot(None)
+        ).order_by(fichas_table.c.rodovia),
+        'seletor: busca por termo': _consulta_selecao('OAE-12', 20, dialeto),
+        'busca textual': busca,
+    }
+
+def relatorio_planos(engine=None):
+    """Plano de execução (EXPLAIN) de cada consulta de referência: {nome: [linhas do plano]}
+    
+    Uma consulta que falha (ex.: schema de uma versão anterior) fica no relatório como "n/a (erro)",
+    sem interromper as demais nem a migração.
+    """
+    engine = engine or get_db_engine()
+    postgres = engine.dialect.name == 'postgresql'
+    prefixo = "EXPLAIN" if postgres else "EXPLAIN QUERY PLAN"
+    
+    planos = {}
+    with engine.connect() as conn:
+        fichas_table = get_fichas_table()
+        inspetor = inspect(conn)
+        tabelas_banco = set(inspetor.get_table_names())
+        colunas_banco = (
+            {coluna['name'] for coluna in inspetor.get_columns(fichas_table.name)}
+            if fichas_table.name in tabelas_banco else set(fichas_table.c.keys())
+        )
+        for nome, stmt in _consultas_referencia(engine.dialect.name, colunas_banco, tabelas_banco).items():
+            if isinstance(stmt, str):
+                planos[nome] = [stmt]
+                continue
+            try:
+                sql = str(stmt.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+                linhas = conn.execute(text(f"{prefixo} {sql}")).fetchall()
+                planos[nome] = [linha[0] if postgres else linha[-1] for linha in linhas]
+            except Exception as e:
+                # No PostgreSQL o erro aborta a transação: as próximas consultas começam outra
+                conn.rollback()
+                planos[nome] = [f"n/a ({str(getattr(e, 'orig', e)).strip()})"]
+    return planos
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações pendentes do banco de fichas")
+    parser.add_argument('--relatorio', action='store_true', help="Mostra os planos das consultas antes e depois")
+    parser.add_argument('--json', action='store_true', help="Relatório em JSON")
+    args = parser.parse_args()
+    
+    engine = get_db_engine()
+    if engine is None:
+        print("Banco de dados não configurado", file=sys.stderr)
+        sys.exit(1)
+    
+    antes = relatorio_planos(engine) if args.relatorio else None
+    aplicadas = aplicar_migracoes(
+        engine, callback_progresso=lambda versao, passo: print(f"[{versao}] {passo}", file=sys.stderr, flush=True)
+    )
+    if not aplicadas and migracoes_pendentes(engine):
+        print("Outro processo está aplicando as migrações; execute novamente quando ele terminar", file=sys.stderr)
+        sys.exit(1)
+    print(f"Migrações aplicadas: {aplicadas or 'nenhuma pendente'}", file=sys.stderr)
+    
+    if args.relatorio:
+        depois = relatorio_planos(engine)
+        if args.json:
+            print(json.dumps({'aplicadas': aplicadas, 'antes': antes, 'depois': depois}, ensure_ascii=False, indent=2))
+        else:
+            for nome in depois:
+                print(f"\n== {nome}")
+                print("  antes:")
+                print("\n".join(f"    {linha}" for linha in antes[nome]))
+                print("  depois:")
+                print("\n".join(f"    {linha}" for linha in depois[nome]))
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,8 @@
-from sqlalchemy import Table, Column, Integer, String, MetaData, Date, inspect, text, UniqueConstraint
-from utils.config import get_db_engine
+from sqlalchemy import Table, Column, Integer, String, MetaData, Date, DateTime, inspect, UniqueConstraint, select, tuple_, or_
+from utils.config import get_db_engine, conexao_banco
+import sys
+import time
+import threading
 import streamlit as st
 
 metadata = MetaData()
@@ -25,6 +28,7 @@ fichas_table = Table('fichas_inspecao', metadata,
                     Column('obra', String(255)),
                     Column('sentido', String(100)),
                     Column('km', String(100)),
+                    Column('km_m', Integer),  # km em metros ('123+450' -> 123450), para consultas por trecho
                     Column('ic', String(255)),
                     Column('uir', String(255)),
                     Column('uie', String(255)),
@@ -46,42 +50,133 @@ fichas_table = Table('fichas_inspecao', metadata,
                     UniqueConstraint('concessionaria', 'rodovia', 'km', 'ano_inspecao', name='uq_ficha_completa')
 )
 
-def verificar_duplicata_existe(dados):
-    """Verifica se já existe uma ficha com os mesmos dados"""
+# Contagens pré-agregadas do dashboard, mantidas por delta a cada escrita em fichas_inspecao.
+# Dimensões nulas usam sentinelas ('' e 0), pois fazem parte da chave primária
+rollup_classificacao_table = Table('fichas_rollup_classificacao', metadata,
+                    Column('ano_inspecao', Integer, primary_key=True, autoincrement=False),
+                    Column('orgao_regulador', String(50), primary_key=True),
+                    Column('concessionaria', String(255), primary_key=True),
+                    Column('rodovia', String(255), primary_key=True),
+                    # Bits das classificações preenchidas: 1 estrutural, 2 funcional, 4 durabilidade
+                    Column('mascara_classificacao', Integer, primary_key=True, autoincrement=False),
+                    # 'total' (uma por ficha, classificacao '') ou o tipo da classificação
+                    Column('tipo_classificacao', String(20), primary_key=True),
+                    Column('classificacao', String(10), primary_key=True),
+                    Column('quantidade', Integer, nullable=False)
+)
+
+# Migrações já aplicadas (ver src/database/migrations.py)
+migracoes_table = Table('schema_migrations', metadata,
+                    Column('versao', Integer, primary_key=True, autoincrement=False),
+                    Column('descricao', String(255)),
+                    Column('aplicada_em', DateTime)
+)
+
+# Contador de escritas (linha única, id = 1), incrementado na mesma transação de cada escrita em
+# fichas_inspecao: carimba o cache de consultas de todos os processos (ver src/database/query_cache.py)
+versao_dados_table = Table('fichas_versao_dados', metadata,
+                    Column('id', Integer, primary_key=True, autoincrement=False),
+                    Column('versao', Integer, nullable=False)
+)
+
+# Busca textual (buscar_fichas): colunas pesquisadas; no PostgreSQL, o documento coberto pelo índice GIN
+# (a consulta repete a mesma expressão); no SQLite, a tabela FTS5 mantida por triggers
+COLUNAS_BUSCA_TEXTUAL = ('obra', 'tipo_pav', 'codigo', 'codigo_artesp')
+DOCUMENTO_BUSCA_POSTGRES = "to_tsvector('portuguese'::regconfig, {})".format(
+    " || ' ' || ".join(f"coalesce({coluna}, '')" for coluna in COLUNAS_BUSCA_TEXTUAL)
+)
+TABELA_BUSCA_SQLITE = 'fichas_busca'
+
+# Restrições únicas da tabela: nome -> colunas
+RESTRICOES_UNICAS = {
+    restricao.name: tuple(restricao.columns.keys())
+    for restricao in sorted(
+        (r for r in fichas_table.constraints if isinstance(r, UniqueConstraint)),
+        key=lambda r: r.name
+    )
+}
+
+# Fichas por consulta na detecção de duplicatas (mantém o número de parâmetros dentro do limite do driver)
+TAMANHO_BLOCO_DUPLICATAS = 500
+
+def _chave_restricao(dados, colunas):
+    """Chave da ficha em uma restrição; None se alguma coluna for nula (NULL nunca conflita)"""
+    chave = tuple(dados.get(coluna) for coluna in colunas)
+    return None if any(valor is None for valor in chave) else chave
+
+def _consultar_chaves_existentes(conn, lote, restricoes=RESTRICOES_UNICAS, ignorar_ids=frozenset()):
+    """Uma consulta para o bloco: chaves já gravadas em cada restrição única (fora das fichas ignoradas)"""
+    condicoes = []
+    for colunas in restricoes.values():
+        chaves = {chave for chave in (_chave_restricao(dados, colunas) for dados in lote) if chave}
+        if not chaves:
+            continue
+        if len(colunas) == 1:
+            condicoes.append(fichas_table.c[colunas[0]].in_([chave[0] for chave in chaves]))
+        else:
+            condicoes.append(tuple_(*[fichas_table.c[coluna] for coluna in colunas]).in_(list(chaves)))
+    
+    existentes = {nome: set() for nome in restricoes}
+    if not condicoes:
+        return existentes
+    
+    colunas_chave = sorted({coluna for colunas in restricoes.values() for coluna in colunas} | {'id'})
+    stmt = select(*[fichas_table.c[coluna] for coluna in colunas_chave]).where(or_(*condicoes))
+    for linha in conn.execute(stmt).mappings():
+        if linha['id'] in ignorar_ids:
+            continue
+        for nome, colunas in restricoes.items():
+            chave = _chave_restricao(linha, colunas)
+            if chave:
+                existentes[nome].add(chave)
+    return existentes
+
+def verificar_duplicatas_lote(dados_lista, conn=None, restricoes=None, ignorar_ids=()):
+    """Verifica um lote inteiro contra as três restrições únicas (banco e o próprio lote)
+    
+    Retorna, para cada ficha, a lista das restrições violadas (vazia = ficha nova), ou None em caso de erro.
+    Uma ficha que repete outra anterior do mesmo lote também é marcada como duplicata.
+    Em atualizações, restricoes limita a verificação às restrições afetadas e ignorar_ids exclui as
+    fichas sendo atualizadas (suas chaves atuais deixam de existir).
+    """
     try:
-        engine = get_db_engine()
-        if engine is None:
-            return False
+        if conn is None:
+            if get_db_engine() is None:
+                return [[] for _ in dados_lista]
+            with conexao_banco() as nova_conn:
+                return verificar_duplicatas_lote(dados_lista, nova_conn, restricoes, ignorar_ids)
         
-        with engine.connect() as conn:
-            # Verificar por código e data de inspeção
-            if dados.get('codigo') and dados.get('data_inspecao'):
-                query = text("""
-                    SELECT COUNT(*) FROM fichas_inspecao 
-                    WHERE codigo = :codigo AND data_inspecao = :data_inspecao
-                """)
-                result = conn.execute(query, {
-                    'codigo': dados['codigo'],
-                    'data_inspecao': dados['data_inspecao']
-                })
-                if result.scalar() > 0:
-                    return True
-            
-            # Verificar por arquivo S3
-            if dados.get('arquivo_s3'):
-                query = text("""
-                    SELECT COUNT(*) FROM fichas_inspecao 
-                    WHERE arquivo_s3 = :arquivo_s3
-                """)
-                result = conn.execute(query, {'arquivo_s3': dados['arquivo_s3']})
-                if result.scalar() > 0:
-                    return True
+        restricoes = RESTRICOES_UNICAS if restricoes is None else {nome: RESTRICOES_UNICAS[nome] for nome in restricoes}
+        ignorar_ids = frozenset(ignorar_ids)
         
-        return False
+        existentes = {nome: set() for nome in restricoes}
+        for inicio in range(0, len(dados_lista), TAMANHO_BLOCO_DUPLICATAS):
+            bloco = dados_lista[inicio:inicio + TAMANHO_BLOCO_DUPLICATAS]
+            for nome, chaves in _consultar_chaves_existentes(conn, bloco, restricoes, ignorar_ids).items():
+                existentes[nome] |= chaves
+        
+        conflitos = []
+        for dados in dados_lista:
+            chaves = {nome: _chave_restricao(dados, colunas) for nome, colunas in restricoes.items()}
+            violadas = [nome for nome, chave in chaves.items() if chave and chave in existentes[nome]]
+            if not violadas:
+                # Ficha nova: as seguintes do lote passam a conflitar com ela
+                for nome, chave in chaves.items():
+                    if chave:
+                        existentes[nome].add(chave)
+            conflitos.append(violadas)
         
+        return conflitos
+    
     except Exception as e:
-        st.error(f"Erro ao verificar duplicata: {str(e)}")
-        return False
+        invalidar_schema_se_necessario(e)
+        st.error(f"Erro ao verificar duplicatas: {str(e)}")
+        return None
+
+def verificar_duplicata_existe(dados):
+    """Verifica se já existe uma ficha com os mesmos dados"""
+    conflitos = verificar_duplicatas_lote([dados])
+    return bool(conflitos and conflitos[0])
 
 def verificar_tabela_existe():
     """Verifica se a tabela fichas_inspecao existe"""
@@ -112,6 +207,101 @@ def create_tables():
         st.error(f"Erro ao criar tabelas: {str(e)}")
         return False
 
+# Prontidão do schema, verificada uma vez por processo (e não a cada rerun do Streamlit)
+_schema_pronto = False
+_trava_schema = threading.Lock()
+# Com migrações em andamento em outro processo, a verificação se repete no máximo a cada intervalo
+INTERVALO_VERIFICACAO_SCHEMA_S = 5
+_verificacao = {'em': float('-inf')}
+
+# Trechos de mensagens de erro que indicam tabela ausente (PostgreSQL / SQLite)
+ERROS_SCHEMA = ('does not exist', 'no such table', 'UndefinedTable')
+
+def garantir_schema():
+    """Garante que as tabelas existem e que o banco está na versão do código; o resultado fica em cache
+    
+    Cria as tabelas num banco novo e aplica as migrações pendentes (índices CONCURRENTLY, colunas novas,
+    backfill em lotes), sem depender de python -m src.database.migrations. No PostgreSQL só o processo
+    que obtém o advisory lock migra; enquanto ele não termina, os demais não consultam o banco e voltam
+    a verificar a cada INTERVALO_VERIFICACAO_SCHEMA_S segundos.
+    """
+    global _schema_pronto
+    if _schema_pronto:
+        return True
+    
+    with _trava_schema:
+        if _schema_pronto:
+            return True
+        if time.monotonic() - _verificacao['em'] < INTERVALO_VERIFICACAO_SCHEMA_S:
+            return False
+        _verificacao['em'] = time.monotonic()
+        
+        if not verificar_tabela_existe():
+            if not create_tables():
+                return False
+        if not _aplicar_migracoes_pendentes():
+            return False
+        
+        pendentes = _migracoes_pendentes()
+        if pendentes is None:
+            return False
+        if pendentes:
+            mensagem = f"Migrações {pendentes} em andamento em outro processo; tentando novamente em instantes."
+            st.warning(f"⚠️ {mensagem}")
+            print(mensagem, file=sys.stderr)
+            return False
+        _schema_pronto = True
+        return True
+
+def _aplicar_migracoes_pendentes():
+    """Migrações versionadas (tabelas auxiliares, colunas e índices); sem esperar se outro processo migra"""
+    try:
+        from src.database.migrations import aplicar_migracoes
+        
+        aplicar_migracoes(get_db_engine())
+        return True
+    except Exception as e:
+        st.error(f"Erro ao aplicar migrações do banco: {str(e)}")
+        return False
+
+def _migracoes_pendentes():
+    """Versões de migração ainda não aplicadas (None se não foi possível verificar)"""
+    try:
+        from src.database.migrations import migracoes_pendentes
+        
+        return migracoes_pendentes(get_db_engine())
+    except Exception as e:
+        st.error(f"Erro ao verificar migrações do banco: {str(e)}")
+        return None
+
+def invalidar_schema():
+    """Força nova verificação do schema na próxima chamada de garantir_schema"""
+    global _schema_pronto
+    _schema_pronto = False
+    _verificacao['em'] = float('-inf')
+
+def eh_erro_de_schema(erro):
+    """Indica se o erro do banco vem de uma tabela ausente (ex.: banco recriado com o app no ar)"""
+    mensagem = str(erro)
+    return any(trecho in mensagem for trecho in ERROS_SCHEMA)
+
+def invalidar_schema_se_necessario(erro):
+    """Invalida o cache de schema apenas para erros de tabela ausente"""
+    if eh_erro_de_schema(erro):
+        invalidar_schema()
+
 def get_fichas_table():
     """Retorna a tabela de fichas"""
     return fichas_table
+
+def get_rollup_table():
+    """Retorna a tabela de contagens pré-agregadas"""
+    return rollup_classificacao_table
+
+def get_migracoes_table():
+    """Retorna a tabela de controle das migrações"""
+    return migracoes_table
+
+def get_versao_dados_table():
+    """Retorna a tabela do contador de escritas"""
+    return versao_dados_table
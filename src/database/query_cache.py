@@ -0,0 +1,186 @@
+import sys
+import copy
+import time
+import pickle
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from sqlalchemy import select, update
+from utils.config import conexao_banco
+from src.database.models import get_versao_dados_table
+
+# Cache de resultados de consultas compartilhado por todas as sessões do processo.
+# Cada entrada guarda a versão das tabelas lidas no momento em que a consulta começou; toda escrita
+# incrementa a versão após o commit, então um resultado anterior à escrita nunca é servido depois dela.
+# Escritas de outros processos (ingestão em lote pela linha de comando, outras instâncias do app) chegam
+# pelo contador de fichas_versao_dados: incrementado na transação de cada escrita e lido (uma linha pela
+# chave primária) antes de servir um acerto, ele também carimba as entradas.
+TABELA_FICHAS = 'fichas_inspecao'
+TABELA_ROLLUP = 'fichas_rollup_classificacao'
+
+ORCAMENTO_PADRAO_MB = 64
+# Idade máxima de um resultado (as escritas já o invalidam pelas versões acima)
+TTL_PADRAO_S = 600
+
+_trava = threading.Lock()
+_entradas = OrderedDict()  # chave -> {'versoes', 'valor', 'tamanho', 'criado_em'}
+_versoes = {}
+_carregando = {}
+_estado = {'orcamento': None, 'bytes': 0, 'acertos': 0, 'faltas': 0, 'descartes': 0}
+
+def _orcamento_bytes():
+    if _estado['orcamento'] is None:
+        try:
+            megabytes = float(st.secrets.get('QUERY_CACHE_MB', ORCAMENTO_PADRAO_MB))
+        except Exception:
+            megabytes = ORCAMENTO_PADRAO_MB
+        _estado['orcamento'] = int(megabytes * 1024 * 1024)
+    return _estado['orcamento']
+
+def configurar(orcamento_mb):
+    """Redefine o orçamento de memória (em MB) e descarta o que exceder"""
+    with _trava:
+        _estado['orcamento'] = int(orcamento_mb * 1024 * 1024)
+        _descartar_excedente()
+
+def chave_consulta(stmt, *extras):
+    """Chave de cache de um statement SQLAlchemy: SQL compilado + parâmetros (+ extras do chamador)"""
+    compilado = stmt.compile()
+    parametros = tuple(sorted((nome, repr(valor)) for nome, valor in compilado.params.items()))
+    return (str(compilado), parametros) + extras
+
+def _tamanho(valor):
+    """Estimativa do tamanho em memória de um resultado"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True, index=True).sum())
+    try:
+        return len(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(valor)
+
+def _copia(valor):
+    """Quem chama pode alterar o resultado (ex.: renomear colunas) sem afetar o cache"""
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy()
+    return copy.deepcopy(valor)
+
+def _versoes_atuais(tabelas):
+    return tuple(_versoes.get(tabela, 0) for tabela in tabelas)
+
+def versao_banco(conn=None):
+    """Contador de escritas gravado no banco, lido em conn ou na conexão da operação corrente"""
+    versao_dados_table = get_versao_dados_table()
+    stmt = select(versao_dados_table.c.versao).where(versao_dados_table.c.id == 1)
+    if conn is not None:
+        return conn.execute(stmt).scalar()
+    with conexao_banco() as conn:
+        return conn.execute(stmt).scalar()
+
+def registrar_escrita(conn):
+    """Incrementa o contador de escritas na transação de conn (a mesma da escrita em fichas_inspecao)
+    
+    A linha fica travada até o commit: chamar como último comando da transação, para que escritas
+    concorrentes esperem só pelo commit.
+    """
+    versao_dados_table = get_versao_dados_table()
+    conn.execute(
+        update(versao_dados_table).where(versao_dados_table.c.id == 1)
+        .values(versao=versao_dados_table.c.versao + 1)
+    )
+
+def _remover(chave):
+    entrada = _entradas.pop(chave, None)
+    if entrada is not None:
+        _estado['bytes'] -= entrada['tamanho']
+
+def _descartar_excedente():
+    orcamento = _orcamento_bytes()
+    while _entradas and _estado['bytes'] > orcamento:
+        _, entrada = _entradas.popitem(last=False)
+        _estado['bytes'] -= entrada['tamanho']
+        _estado['descartes'] += 1
+
+def _buscar(chave, tabelas, ttl, banco):
+    """Entrada válida para a chave (versões iguais e dentro do TTL) ou None; chamar com a trava"""
+    entrada = _entradas.get(chave)
+    if entrada is None:
+        return None
+    if (entrada['versoes'] != (banco,) + _versoes_atuais(tabelas)
+            or time.monotonic() - entrada['criado_em'] > ttl):
+        _remover(chave)
+        return None
+    _entradas.move_to_end(chave)
+    return entrada
+
+def obter_ou_carregar(chave, carregar, tabelas=(TABELA_FICHAS,), ttl=TTL_PADRAO_S):
+    """Read-through: devolve o resultado em cache da chave ou executa carregar() e guarda o resultado
+    
+    tabelas são as tabelas lidas pela consulta (cuja versão carimba a entrada, junto com a do banco).
+    Sessões que pedem a mesma chave ao mesmo tempo esperam uma única execução. Exceções de carregar()
+    não são guardadas.
+    """
+    chave = (tuple(tabelas),) + tuple(chave)
+    # Lida antes da consulta: uma escrita de outro processo com commit depois dela muda o contador
+    banco = versao_banco()
+    
+    with _trava:
+        entrada = _buscar(chave, tabelas, ttl, banco)
+        if entrada is not None:
+            _estado['acertos'] += 1
+            return _copia(entrada['valor'])
+        trava_chave = _carregando.setdefault(chave, threading.Lock())
+    
+    with trava_chave:
+        with _trava:
+            entrada = _buscar(chave, tabelas, ttl, banco)
+            if entrada is not None:
+                _estado['acertos'] += 1
+                return _copia(entrada['valor'])
+            _estado['faltas'] += 1
+            # Versão lida antes da consulta: uma escrita concorrente invalida o resultado que vai sair
+            versoes = _versoes_atuais(tabelas)
+        
+        try:
+            valor = carregar()
+        finally:
+            with _trava:
+                _carregando.pop(chave, None)
+        
+        tamanho = _tamanho(valor)
+        with _trava:
+            # Um único resultado maior que 1/4 do orçamento expulsaria o restante do cache
+            if tamanho <= _orcamento_bytes() // 4 and versoes == _versoes_atuais(tabelas):
+                _remover(chave)
+                _entradas[chave] = {'versoes': (banco,) + versoes, 'valor': valor, 'tamanho': tamanho, 'criado_em': time.monotonic()}
+                _estado['bytes'] += tamanho
+                _descartar_excedente()
+        return _copia(valor)
+
+def versao_tabela(tabela):
+    with _trava:
+        return _versoes.get(tabela, 0)
+
+def incrementar_versao(*tabelas):
+    """Chamada após o commit de qualquer escrita: invalida todos os resultados que leram essas tabelas"""
+    with _trava:
+        for tabela in tabelas:
+            _versoes[tabela] = _versoes.get(tabela, 0) + 1
+
+def limpar_cache():
+    with _trava:
+        _entradas.clear()
+        _estado['bytes'] = 0
+
+def estatisticas_cache():
+    """Acertos, faltas, descartes por LRU, entradas e memória usada"""
+    with _trava:
+        return {
+            'acertos': _estado['acertos'],
+            'faltas': _estado['faltas'],
+            'descartes': _estado['descartes'],
+            'entradas': len(_entradas),
+            'bytes': _estado['bytes'],
+            'orcamento_bytes': _orcamento_bytes(),
+            'versoes': dict(_versoes),
+        }
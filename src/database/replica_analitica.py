@@ -0,0 +1,150 @@
+import sys
+import time
+import argparse
+import datetime
+import threading
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from utils.config import get_db_engine, obter_configuracao
+from src.database import query_cache
+from src.database.models import get_fichas_table
+
+# Réplica analítica opcional em DuckDB (DB_ANALYTICS_PATH; requer o pacote duckdb): as agregações do
+# dashboard rodam localmente, em formato colunar, sobre uma cópia de fichas_inspecao
+TAMANHO_LOTE_SINCRONIZACAO = 50_000
+# A réplica só atende enquanto o contador de escritas do banco for o da última sincronização: depois de
+# qualquer escrita (deste ou de outro processo) as leituras voltam ao banco principal até a próxima
+INTERVALO_SINCRONIZACAO_PADRAO_S = 300
+
+_trava = threading.Lock()
+_estado = {'conexao': None, 'versao': None, 'sincronizada_em': None, 'sincronizando': False}
+
+def _caminho_replica():
+    return obter_configuracao('DB_ANALYTICS_PATH', '')
+
+def _intervalo_sincronizacao():
+    return float(obter_configuracao('DB_ANALYTICS_SYNC_S', INTERVALO_SINCRONIZACAO_PADRAO_S))
+
+def replica_configurada():
+    if not _caminho_replica():
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _conexao_replica():
+    """Conexão DuckDB do processo (um arquivo DuckDB aceita um único processo escrevendo)"""
+    import duckdb
+    
+    with _trava:
+        if _estado['conexao'] is None:
+            _estado['conexao'] = duckdb.connect(_caminho_replica())
+        return _estado['conexao']
+
+def _ddl_tabela(nome, tabela):
+    colunas = ", ".join(f"{coluna.name} {coluna.type.compile(dialect=postgresql.dialect())}" for coluna in tabela.columns)
+    return f"CREATE TABLE {nome} ({colunas})"
+
+def sincronizar_replica(engine=None):
+    """Copia fichas_inspecao do banco principal para a réplica, em lotes, e troca a tabela de uma vez
+    
+    Retorna o número de fichas copiadas.
+    """
+    engine = engine or get_db_engine()
+    fichas_table = get_fichas_table()
+    colunas = [coluna.name for coluna in fichas_table.columns]
+    # Versões lidas antes da cópia: uma escrita durante a cópia deixa a réplica desatualizada, não inconsistente
+    with engine.connect() as conn:
+        versao = (query_cache.versao_banco(conn), query_cache.versao_tabela(query_cache.TABELA_FICHAS))
+    
+    duck = _conexao_replica().cursor()
+    try:
+        duck.execute("DROP TABLE IF EXISTS fichas_inspecao_nova")
+        duck.execute(_ddl_tabela('fichas_inspecao_nova', fichas_table))
+        
+        copiadas = 0
+        with engine.connect() as conn:
+            conn = conn.execution_options(stream_results=True)
+            for lote in pd.read_sql(select(fichas_table), conn, chunksize=TAMANHO_LOTE_SINCRONIZACAO):
+                duck.register('lote_fichas', lote[colunas])
+                duck.execute("INSERT INTO fichas_inspecao_nova BY NAME SELECT * FROM lote_fichas")
+                duck.unregister('lote_fichas')
+                copiadas += len(lote)
+        
+        duck.execute("BEGIN TRANSACTION")
+        duck.execute("DROP TABLE IF EXISTS fichas_inspecao")
+        duck.execute("ALTER TABLE fichas_inspecao_nova RENAME TO fichas_inspecao")
+        duck.execute("COMMIT")
+    finally:
+        duck.close()
+    
+    with _trava:
+        _estado['versao'] = versao
+        _estado['sincronizada_em'] = time.monotonic()
+    return copiadas
+
+def _sincronizar_em_segundo_plano():
+    with _trava:
+        if _estado['sincronizando']:
+            return
+        _estado['sincronizando'] = True
+    
+    def executar():
+        try:
+            sincronizar_replica()
+        except Exception as e:
+            print(f"Erro ao sincronizar réplica analítica: {e}", file=sys.stderr)
+        finally:
+            with _trava:
+                _estado['sincronizando'] = False
+    
+    threading.Thread(target=executar, name='sincronizar_replica', daemon=True).start()
+
+def _replica_atualizada():
+    """A réplica reflete todas as escritas no banco (de qualquer processo); se não, agenda uma sincronização"""
+    with _trava:
+        versao, sincronizada_em = _estado['versao'], _estado['sincronizada_em']
+    
+    atualizada = versao is not None and versao == (
+        query_cache.versao_banco(), query_cache.versao_tabela(query_cache.TABELA_FICHAS)
+    )
+    vencida = sincronizada_em is None or time.monotonic() - sincronizada_em > _intervalo_sincronizacao()
+    if not atualizada or vencida:
+        _sincronizar_em_segundo_plano()
+    return atualizada
+
+def ler_analitico(stmt):
+    """Executa uma consulta de leitura sobre fichas_inspecao na réplica e retorna um DataFrame
+    
+    Retorna None se a réplica não estiver configurada ou estiver atrás das escritas no banco;
+    o chamador então consulta o banco principal.
+    """
+    if not replica_configurada() or not _replica_atualizada():
+        return None
+    
+    # DuckDB aceita o SQL do PostgreSQL gerado pelo SQLAlchemy
+    sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+    duck = _conexao_replica().cursor()
+    try:
+        return duck.execute(sql).df()
+    finally:
+        duck.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincroniza a réplica analítica (DuckDB) com o banco principal")
+    parser.parse_args()
+    
+    if not replica_configurada():
+        print("Defina DB_ANALYTICS_PATH e instale o pacote duckdb (pip install duckdb)", file=sys.stderr)
+        sys.exit(1)
+    
+    inicio = datetime.datetime.now()
+    copiadas = sincronizar_replica()
+    print(f"Réplica sincronizada: {copiadas} ficha(s) em {(datetime.datetime.now() - inicio).total_seconds():.1f}s",
+          file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
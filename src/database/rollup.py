@@ -0,0 +1,229 @@
+import argparse
+from collections import Counter
+import pandas as pd
+import streamlit as st
+from sqlalchemy import select, delete, insert, update, literal, case, func, and_, union_all
+from utils.config import get_db_engine
+from src.database.models import get_fichas_table, get_rollup_table, garantir_schema
+from src.database import query_cache
+
+# Dimensões do rollup (além do tipo/valor da classificação)
+DIMENSOES_ROLLUP = ['ano_inspecao', 'orgao_regulador', 'concessionaria', 'rodovia']
+CAMPOS_CLASSIFICACAO = ['estrutural', 'funcional', 'durabilidade']
+BITS_CLASSIFICACAO = {'estrutural': 1, 'funcional': 2, 'durabilidade': 4}
+CHAVE_ROLLUP = DIMENSOES_ROLLUP + ['mascara_classificacao', 'tipo_classificacao', 'classificacao']
+
+# Colunas de fichas_inspecao que afetam o rollup (para ler o estado anterior em updates/deletes)
+COLUNAS_ROLLUP_FICHA = DIMENSOES_ROLLUP + CAMPOS_CLASSIFICACAO
+
+def _mascara(ficha):
+    return sum(bit for campo, bit in BITS_CLASSIFICACAO.items() if ficha.get(campo) is not None)
+
+def _chaves_ficha(ficha):
+    """Linhas do rollup para as quais a ficha conta: o total e cada classificação preenchida"""
+    base = (
+        ficha.get('ano_inspecao') or 0,
+        ficha.get('orgao_regulador') or '',
+        ficha.get('concessionaria') or '',
+        ficha.get('rodovia') or '',
+        _mascara(ficha),
+    )
+    yield base + ('total', '')
+    for campo in CAMPOS_CLASSIFICACAO:
+        if ficha.get(campo) is not None:
+            yield base + (campo, ficha[campo])
+
+def calcular_delta(fichas_removidas=(), fichas_adicionadas=()):
+    """Variação das contagens (chave -> delta) entre o estado anterior e o novo das fichas"""
+    delta = Counter()
+    for ficha in fichas_removidas:
+        for chave in _chaves_ficha(ficha):
+            delta[chave] -= 1
+    for ficha in fichas_adicionadas:
+        for chave in _chaves_ficha(ficha):
+            delta[chave] += 1
+    return {chave: valor for chave, valor in delta.items() if valor}
+
+def _insert_dialeto(conn):
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialeto
+    elif conn.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as insert_dialeto
+    else:
+        return None
+    return insert_dialeto
+
+def aplicar_delta(conn, delta):
+    """Soma o delta às contagens, na transação de `conn` (a mesma da escrita em fichas_inspecao)"""
+    if not delta:
+        return
+    
+    rollup_table = get_rollup_table()
+    # Chaves em ordem fixa: escritas concorrentes travam as linhas do rollup na mesma ordem (sem deadlock)
+    linhas = [dict(zip(CHAVE_ROLLUP, chave), quantidade=valor) for chave, valor in sorted(delta.items())]
+    
+    insert_dialeto = _insert_dialeto(conn)
+    if insert_dialeto is not None:
+        stmt = insert_dialeto(rollup_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=CHAVE_ROLLUP,
+            set_={'quantidade': rollup_table.c.quantidade + stmt.excluded.quantidade}
+        )
+        conn.execute(stmt, linhas)
+    else:
+        for linha in linhas:
+            condicao = and_(*[rollup_table.c[coluna] == linha[coluna] for coluna in CHAVE_ROLLUP])
+            resultado = conn.execute(
+                update(rollup_table).where(condicao).values(quantidade=rollup_table.c.quantidade + linha['quantidade'])
+            )
+            if resultado.rowcount == 0:
+                conn.execute(insert(rollup_table).values(**linha))
+    
+    if any(valor < 0 for valor in delta.values()):
+        conn.execute(delete(rollup_table).where(rollup_table.c.quantidade <= 0))
+
+def ler_estado_rollup(conn, condicao, bloquear=False):
+    """Valores atuais das colunas do rollup para as fichas que atendem à condição
+    
+    bloquear=True (SELECT ... FOR UPDATE) para ler o estado anterior: uma escrita concorrente na mesma
+    ficha espera o commit, e o delta nunca parte de um estado já superado.
+    """
+    fichas_table = get_fichas_table()
+    stmt = select(*[fichas_table.c[coluna] for coluna in COLUNAS_ROLLUP_FICHA]).where(condicao)
+    if bloquear:
+        stmt = stmt.with_for_update()
+    return [dict(linha) for linha in conn.execute(stmt).mappings()]
+
+def reconstruir_rollup(conn=None):
+    """Recalcula o rollup inteiro a partir de fichas_inspecao (INSERT ... SELECT com GROUP BY)"""
+    if conn is None:
+        with get_db_engine().begin() as nova_conn:
+            reconstruir_rollup(nova_conn)
+        query_cache.incrementar_versao(query_cache.TABELA_ROLLUP)
+        return
+    
+    fichas_table = get_fichas_table()
+    rollup_table = get_rollup_table()
+    
+    dimensoes = [
+        func.coalesce(fichas_table.c.ano_inspecao, 0),
+        func.coalesce(fichas_table.c.orgao_regulador, ''),
+        func.coalesce(fichas_table.c.concessionaria, ''),
+        func.coalesce(fichas_table.c.rodovia, ''),
+        sum(
+            case((fichas_table.c[campo].isnot(None), bit), else_=0)
+            for campo, bit in BITS_CLASSIFICACAO.items()
+        ),
+    ]
+    consultas = [
+        select(*dimensoes, literal('total'), literal(''), func.count()).group_by(*dimensoes)
+    ]
+    for campo in CAMPOS_CLASSIFICACAO:
+        consultas.append(
+            select(*dimensoes, literal(campo), fichas_table.c[campo], func.count())
+            .where(fichas_table.c[campo].isnot(None))
+            .group_by(*dimensoes, fichas_table.c[campo])
+        )
+    
+    conn.execute(delete(rollup_table))
+    conn.execute(insert(rollup_table).from_select(CHAVE_ROLLUP + ['quantidade'], union_all(*consultas)))
+
+def _filtro_integral(valor, opcoes):
+    """Seleção de classificação que o rollup atende: vazia (sem filtro) ou com todas as opções (não nulos)"""
+    if valor is None or len(valor) == 0:
+        return 'livre'
+    if set(valor) >= set(opcoes):
+        return 'preenchida'
+    return None
+
+def _contagens_fichas(filtros):
+    """Mesmas contagens, agrupadas diretamente sobre fichas_inspecao"""
+    from src.database.crud_operations import contar_por_valor, resumir_registros
+    
+    return {
+        'contagens': {coluna: contar_por_valor(coluna, filtros) for coluna in ['ano_inspecao'] + CAMPOS_CLASSIFICACAO},
+        'resumo': resumir_registros(filtros),
+        'origem': 'fichas',
+    }
+
+def obter_contagens_dashboard(filtros=None):
+    """Contagens do dashboard (por ano, por classificação e resumo) com os filtros dos widgets
+    
+    Lê as poucas linhas do rollup sempre que os filtros de classificação forem "todas" ou vazios;
+    seleções parciais de classificação cruzam campos da mesma ficha e caem no GROUP BY sobre fichas_inspecao,
+    assim como filtros em colunas que não são dimensões do rollup (ex.: sentido, faixa de km).
+    Retorna {'contagens': {coluna: DataFrame[coluna, quantidade]}, 'resumo': dict, 'origem': 'rollup' | 'fichas'}.
+    """
+    from src.database.crud_operations import obter_valores_distintos, construir_condicoes_filtro, _ler_em_cache
+    
+    filtros = dict(filtros or {})
+    fora_do_rollup = {
+        coluna: valor for coluna, valor in filtros.items()
+        if coluna not in DIMENSOES_ROLLUP and coluna not in BITS_CLASSIFICACAO
+    }
+    if construir_condicoes_filtro(fora_do_rollup):
+        return _contagens_fichas(filtros)
+    
+    mascara_exigida = 0
+    for campo, bit in BITS_CLASSIFICACAO.items():
+        situacao = _filtro_integral(filtros.get(campo), obter_valores_distintos(campo))
+        if situacao is None:
+            return _contagens_fichas(filtros)
+        if situacao == 'preenchida':
+            mascara_exigida |= bit
+    
+    try:
+        if not garantir_schema():
+            return _contagens_fichas(filtros)
+        
+        rollup_table = get_rollup_table()
+        condicoes = construir_condicoes_filtro(
+            {coluna: valor for coluna, valor in filtros.items() if coluna in DIMENSOES_ROLLUP}, rollup_table
+        )
+        if mascara_exigida:
+            condicoes.append(rollup_table.c.mascara_classificacao.op('&')(mascara_exigida) == mascara_exigida)
+        
+        stmt = select(rollup_table).where(*condicoes, rollup_table.c.quantidade > 0)
+        df = _ler_em_cache(stmt, lambda conn: pd.read_sql(stmt, conn), tabelas=(query_cache.TABELA_ROLLUP,))
+    
+    except Exception as e:
+        st.error(f"Erro ao ler contagens pré-agregadas: {str(e)}")
+        return _contagens_fichas(filtros)
+    
+    totais = df[df['tipo_classificacao'] == 'total']
+    por_ano = totais[totais['ano_inspecao'] != 0]
+    contagens = {
+        'ano_inspecao': por_ano.groupby('ano_inspecao', as_index=False)['quantidade'].sum()
+    }
+    for campo in CAMPOS_CLASSIFICACAO:
+        contagens[campo] = (
+            df[df['tipo_classificacao'] == campo]
+            .groupby('classificacao', as_index=False)['quantidade'].sum()
+            .rename(columns={'classificacao': campo})
+        )
+    
+    resumo = {
+        'total': int(totais['quantidade'].sum()),
+        'concessionarias': totais.loc[totais['concessionaria'] != '', 'concessionaria'].nunique(),
+        'rodovias': totais.loc[totais['rodovia'] != '', 'rodovia'].nunique(),
+        'anos': por_ano['ano_inspecao'].nunique(),
+        'ano_min': int(por_ano['ano_inspecao'].min()) if not por_ano.empty else None,
+        'ano_max': int(por_ano['ano_inspecao'].max()) if not por_ano.empty else None,
+    }
+    return {'contagens': contagens, 'resumo': resumo, 'origem': 'rollup'}
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do rollup de classificações do dashboard")
+    parser.add_argument('--reconstruir', action='store_true', help="Recalcula todas as contagens a partir das fichas")
+    args = parser.parse_args()
+    
+    if args.reconstruir:
+        get_rollup_table().create(get_db_engine(), checkfirst=True)
+        with get_db_engine().begin() as conn:
+            reconstruir_rollup(conn)
+            # Os processos do app descartam as contagens que tinham em cache
+            query_cache.registrar_escrita(conn)
+        print("Rollup reconstruído")
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,9 @@ try:
     from .excel_processor import (
         ler_dados_excel,
         validar_arquivo_excel,
+        sondar_arquivo_excel,
         processar_multiplos_arquivos,
+        processar_lote_paralelo,
         obter_valor_celula
     )
 except ImportError:
@@ -19,7 +21,13 @@ except ImportError:
     def validar_arquivo_excel(arquivo):
         return False
     
-    def processar_multiplos_arquivos(arquivos):
+    def sondar_arquivo_excel(arquivo):
+        return {'valido': False, 'formato': None, 'layout': None, 'concessionaria': None, 'erro': 'indisponível'}
+    
+    def processar_multiplos_arquivos(arquivos, paralelo=False, max_workers=None):
+        return []
+    
+    def processar_lote_paralelo(arquivos, max_workers=None, callback_progresso=None):
         return []
     
     def obter_valor_celula(df, linha, coluna):
@@ -43,7 +51,9 @@ def get_celulas_obrigatorias():
 __all__ = [
     'ler_dados_excel',
     'validar_arquivo_excel',
+    'sondar_arquivo_excel',
     'processar_multiplos_arquivos',
+    'processar_lote_paralelo',
     'obter_valor_celula',
     'get_formatos_suportados',
     'get_celulas_obrigatorias',
@@ -0,0 +1,151 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from src.processing.excel_processor import processar_lote_paralelo
+from src.processing.cell_templates import TIPOS_CAMPOS, VERSAO_TEMPLATES
+
+PREFIXO_FICHAS_S3 = 'fichas_inspecao/'
+EXTENSOES_FICHA = ('.xls', '.xlsx')
+CAMINHO_MANIFESTO_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    '.cache', 'backfill_fichas.json'
+)
+
+# Campos re-derivados por padrão: tudo o que o extrator produz
+CAMPOS_BACKFILL = list(TIPOS_CAMPOS) + ['orgao_regulador']
+
+def carregar_manifesto(caminho, prefixo):
+    """Carrega o checkpoint do backfill; recomeça do zero se o extrator ou o prefixo mudaram"""
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            manifesto = json.load(f)
+        if manifesto.get('versao_extrator') == VERSAO_TEMPLATES and manifesto.get('prefixo') == prefixo:
+            return manifesto
+    
+    return {
+        'versao_extrator': VERSAO_TEMPLATES,
+        'prefixo': prefixo,
+        'iniciado_em': datetime.datetime.now().isoformat(),
+        'concluidos': [],
+        'falhas': {},
+    }
+
+def salvar_manifesto(caminho, manifesto):
+    """Grava o checkpoint de forma atômica (arquivo temporário + rename)"""
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    manifesto['atualizado_em'] = datetime.datetime.now().isoformat()
+    
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+    os.replace(temporario, caminho)
+
+def _baixar_lote(chaves, max_downloads):
+    from src.aws.s3_handler import baixar_arquivo_s3
+    
+    with ThreadPoolExecutor(max_workers=max_downloads) as pool:
+        return list(pool.map(baixar_arquivo_s3, chaves))
+
+def executar_backfill(prefixo=PREFIXO_FICHAS_S3, caminho_manifesto=CAMINHO_MANIFESTO_PADRAO,
+                      tamanho_lote=100, max_workers=None, max_downloads=8, campos=None,
+                      callback_progresso=None):
+    """Re-extrai as fichas já armazenadas no S3 e atualiza fichas_inspecao por arquivo_s3
+    
+    O progresso fica no manifesto a cada lote: uma nova execução retoma de onde parou.
+    callback_progresso(processados, total) é chamado ao fim de cada lote.
+    Uma falha ao listar o bucket levanta exceção antes de qualquer lote (o manifesto não é tocado).
+    """
+    from src.aws.s3_handler import listar_arquivos_s3
+    from src.database.crud_operations import atualizar_fichas_por_arquivo_s3
+    
+    campos = campos or CAMPOS_BACKFILL
+    manifesto = carregar_manifesto(caminho_manifesto, prefixo)
+    concluidos = set(manifesto['concluidos'])
+    
+    chaves = [
+        chave for chave in listar_arquivos_s3(prefixo, propagar_erros=True)
+        if chave.lower().endswith(EXTENSOES_FICHA)
+    ]
+    pendentes = [chave for chave in chaves if chave not in concluidos]
+    
+    resumo = {'total': len(chaves), 'ja_concluidos': len(chaves) - len(pendentes),
+              'processados': 0, 'atualizados': 0, 'falhas': 0}
+    
+    for inicio in range(0, len(pendentes), tamanho_lote):
+        lote = pendentes[inicio:inicio + tamanho_lote]
+        conteudos = _baixar_lote(lote, max_downloads)
+        
+        baixados = [(chave, conteudo) for chave, conteudo in zip(lote, conteudos) if conteudo]
+        for chave, conteudo in zip(lote, conteudos):
+            if not conteudo:
+                manifesto['falhas'][chave] = 'Falha ao baixar do S3'
+        
+        resultados = processar_lote_paralelo([conteudo for _, conteudo in baixados], max_workers=max_workers)
+        
+        registros = []
+        extraidos = []
+        for (chave, _), resultado in zip(baixados, resultados):
+            if resultado['erro']:
+                manifesto['falhas'][chave] = resultado['erro']['mensagem']
+            else:
+                registros.append({**resultado['dados'], 'arquivo_s3': chave})
+                extraidos.append(chave)
+        
+        atualizados = atualizar_fichas_por_arquivo_s3(registros, campos)
+        if atualizados is None:
+            # Lote rejeitado (ex.: violação de unicidade): isolar as fichas problemáticas
+            atualizados = 0
+            sucesso = []
+            for registro in registros:
+                resultado_unitario = atualizar_fichas_por_arquivo_s3([registro], campos)
+                if resultado_unitario is None:
+                    manifesto['falhas'][registro['arquivo_s3']] = 'Falha ao atualizar o banco'
+                else:
+                    atualizados += max(resultado_unitario, 0)
+                    sucesso.append(registro['arquivo_s3'])
+            extraidos = sucesso
+        
+        resumo['atualizados'] += max(atualizados, 0)
+        for chave in extraidos:
+            manifesto['falhas'].pop(chave, None)
+        manifesto['concluidos'].extend(extraidos)
+        
+        salvar_manifesto(caminho_manifesto, manifesto)
+        
+        resumo['processados'] += len(lote)
+        if callback_progresso:
+            callback_progresso(resumo['processados'], len(pendentes))
+    
+    resumo['falhas'] = len(manifesto['falhas'])
+    return resumo
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill: re-extrai as fichas do S3 e atualiza o banco")
+    parser.add_argument('--prefixo', default=PREFIXO_FICHAS_S3, help="Prefixo das fichas no S3")
+    parser.add_argument('--manifesto', default=CAMINHO_MANIFESTO_PADRAO, help="Arquivo de checkpoint")
+    parser.add_argument('--lote', type=int, default=100, help="Fichas por lote (e por checkpoint)")
+    parser.add_argument('--workers', type=int, default=None, help="Processos de extração")
+    parser.add_argument('--downloads', type=int, default=8, help="Downloads simultâneos do S3")
+    parser.add_argument('--campos', nargs='+', choices=CAMPOS_BACKFILL, help="Campos a atualizar (padrão: todos)")
+    args = parser.parse_args()
+    
+    try:
+        resumo = executar_backfill(
+            prefixo=args.prefixo,
+            caminho_manifesto=args.manifesto,
+            tamanho_lote=args.lote,
+            max_workers=args.workers,
+            max_downloads=args.downloads,
+            campos=args.campos,
+            callback_progresso=lambda feitos, total: print(f"{feitos}/{total} fichas processadas", flush=True)
+        )
+    except Exception as e:
+        print(f"Backfill interrompido: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(resumo, ensure_ascii=False))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Quilometragem: '123+450' (km + metros) ou km decimal ('123', '123,45', '123.45'), com prefixo 'km' opcional
+PADRAO_KM_METROS = r'^\s*(?:km\s*)?(\d+)\s*\+\s*(\d+(?:[.,]\d+)?)\s*$'
+PADRAO_KM_DECIMAL = r'^\s*(?:km\s*)?(\d+(?:[.,]\d+)?)\s*$'
+_RE_KM_METROS = re.compile(PADRAO_KM_METROS)
+_RE_KM_DECIMAL = re.compile(PADRAO_KM_DECIMAL)
+
+def _normalizar_datas(serie):
+    """Converte a coluna inteira de datas; valores inválidos viram None"""
+    return pd.to_datetime(serie, errors='coerce', format='mixed').dt.date
+
+def _normalizar_anos(serie):
+    """Converte anos como '2023' ou '2023.0' para inteiro (truncando, como int(float(x)))"""
+    return np.trunc(pd.to_numeric(serie, errors='coerce')).astype('Int64')
+
+def _normalizar_km(serie):
+    """Padroniza o km no formato '123+450' (sem espaços em volta do '+')"""
+    return serie.str.strip().str.replace(r'\s*\+\s*', '+', regex=True)
+
+def km_em_metros(serie):
+    """Converte uma coluna de km em metros inteiros (Int64); formatos não reconhecidos viram <NA>"""
+    serie = serie.astype('string').str.lower()
+    
+    partes = serie.str.extract(PADRAO_KM_METROS)
+    metros = (
+        pd.to_numeric(partes[0], errors='coerce') * 1000
+        + pd.to_numeric(partes[1].str.replace(',', '.', regex=False), errors='coerce')
+    )
+    decimal = pd.to_numeric(
+        serie.str.extract(PADRAO_KM_DECIMAL)[0].str.replace(',', '.', regex=False), errors='coerce'
+    ) * 1000
+    
+    return np.round(metros.fillna(decimal)).astype('Int64')
+
+def km_para_metros(km):
+    """Um único km ('123+450' -> 123450, '12,5' -> 12500) em metros; None se não reconhecido
+    
+    Mesmas regras de km_em_metros, sem montar uma Series por valor (chamada a cada ficha gravada).
+    """
+    if km is None:
+        return None
+    if isinstance(km, (int, float, np.integer, np.floating)):
+        return None if pd.isna(km) else int(round(float(km) * 1000))
+    
+    texto = str(km).lower()
+    partes = _RE_KM_METROS.match(texto)
+    if partes:
+        return int(round(int(partes[1]) * 1000 + float(partes[2].replace(',', '.'))))
+    partes = _RE_KM_DECIMAL.match(texto)
+    if partes:
+        return int(round(float(partes[1].replace(',', '.')) * 1000))
+    return None
+
+def _normalizar_classificacao(serie):
+    """Padroniza códigos de classificação (ex.: ' c1' -> 'C1')"""
+    return serie.str.strip().str.upper()
+
+# Conversores em lote referenciados pelos templates de ficha ('texto' mantém o valor)
+CONVERSORES = {
+    'texto': None,
+    'data': _normalizar_datas,
+    'ano': _normalizar_anos,
+    'km': _normalizar_km,
+    'classificacao': _normalizar_classificacao,
+}
+
+# Conversores que operam sobre texto (coluna convertida para o dtype 'string' antes)
+CONVERSORES_TEXTO = ('km', 'classificacao')
+
+def normalizar_lote(registros, tipos_campos):
+    """Normaliza um lote de células brutas em um único DataFrame, uma passada vetorizada por coluna
+    
+    tipos_campos mapeia campo -> conversor (ver CONVERSORES). Retorna registros tipados
+    (date, int, str ou None) prontos para inserção em lote.
+    """
+    if not registros:
+        return []
+    
+    df = pd.DataFrame.from_records(registros)
+    
+    for campo, tipo in tipos_campos.items():
+        conversor = CONVERSORES[tipo]
+        if conversor is None or campo not in df.columns:
+            continue
+        serie = df[campo].astype('string') if tipo in CONVERSORES_TEXTO else df[campo]
+        df[campo] = conversor(serie)
+    
+    # Voltar para tipos Python (None no lugar de NA/NaN) para o SQLAlchemy
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
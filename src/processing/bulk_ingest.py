@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import hashlib
+import time
+import queue
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from src.processing.excel_processor import processar_lote_paralelo, CONTEXTO_PROCESSOS
+
+EXTENSOES_FICHA = ('.xls', '.xlsx')
+EXTENSOES_PDF = ('.pdf',)
+
+# Marca de fim de fila entre os estágios
+_FIM = object()
+
+def listar_entradas(origem):
+    """Lista fichas e PDFs de um diretório (recursivo) ou de um manifesto (um caminho por linha)"""
+    if os.path.isdir(origem):
+        caminhos = []
+        for raiz, _, arquivos in os.walk(origem):
+            caminhos.extend(os.path.join(raiz, nome) for nome in sorted(arquivos))
+    else:
+        base = os.path.dirname(os.path.abspath(origem))
+        with open(origem, encoding='utf-8') as f:
+            linhas = [linha.strip() for linha in f]
+        caminhos = [
+            linha if os.path.isabs(linha) else os.path.join(base, linha)
+            for linha in linhas if linha and not linha.startswith('#')
+        ]
+    
+    return [c for c in caminhos if c.lower().endswith(EXTENSOES_FICHA + EXTENSOES_PDF)]
+
+def _novas_estatisticas():
+    return {
+        'arquivos': 0, 'bytes': 0, 'fichas_extraidas': 0, 'pdfs': 0,
+        'falhas_leitura': 0, 'falhas_extracao': 0, 'falhas_upload': 0,
+        'fichas_inseridas': 0, 'fichas_duplicadas': 0, 'fichas_rejeitadas': 0,
+        'lotes_banco_com_falha': 0, 'erros': [],
+    }
+
+def _estagio_extracao(caminhos, fila_upload, estatisticas, trava, tamanho_lote, executor, consumidores):
+    """Lê os arquivos do disco e extrai as fichas em lotes, no pool de processos"""
+    try:
+        for inicio in range(0, len(caminhos), tamanho_lote):
+            itens = []
+            for caminho in caminhos[inicio:inicio + tamanho_lote]:
+                try:
+                    with open(caminho, 'rb') as f:
+                        conteudo = f.read()
+                except OSError as e:
+                    with trava:
+                        estatisticas['falhas_leitura'] += 1
+                        estatisticas['erros'].append({'arquivo': caminho, 'erro': str(e)})
+                    continue
+                
+                tipo = 'pdf' if caminho.lower().endswith(EXTENSOES_PDF) else 'ficha'
+                itens.append({'nome': os.path.basename(caminho), 'caminho': caminho, 'tipo': tipo, 'conteudo': conteudo})
+                with trava:
+                    estatisticas['arquivos'] += 1
+                    estatisticas['bytes'] += len(conteudo)
+            
+            fichas = [item for item in itens if item['tipo'] == 'ficha']
+            resultados = processar_lote_paralelo([item['conteudo'] for item in fichas], executor=executor)
+            
+            for item, resultado in zip(fichas, resultados):
+                if resultado['erro']:
+                    with trava:
+                        estatisticas['falhas_extracao'] += 1
+                        estatisticas['erros'].append({'arquivo': item['caminho'], 'erro': resultado['erro']['mensagem']})
+                    item['descartar'] = True
+                else:
+                    item['dados'] = resultado['dados']
+                    with trava:
+                        estatisticas['fichas_extraidas'] += 1
+            
+            for item in itens:
+                if not item.get('descartar'):
+                    fila_upload.put(item)
+    finally:
+        for _ in range(consumidores):
+            fila_upload.put(_FIM)
+
+def _estagio_upload(fila_upload, fila_banco, estatisticas, trava):
+    """Envia fichas e PDFs ao S3; as fichas seguem para o estágio do banco"""
+    from src.aws.s3_handler import salvar_arquivo_s3, salvar_pdf_sem_duplicata
+    
+    try:
+        while True:
+            item = fila_upload.get()
+            if item is _FIM:
+                break
+            
+            try:
+                if item['tipo'] == 'pdf':
+                    chave_s3 = salvar_pdf_sem_duplicata(item['nome'], item['conteudo'], "relatorios_pdf")
+                    with trava:
+                        if chave_s3:
+                            estatisticas['pdfs'] += 1
+                        else:
+                            estatisticas['falhas_upload'] += 1
+                            estatisticas['erros'].append({'arquivo': item['caminho'], 'erro': 'Falha ao salvar PDF no S3'})
+                    continue
+                
+                # Arquivos homônimos em subdiretórios diferentes (enviados no mesmo segundo) teriam a mesma
+                # chave: o hash do conteúdo no nome evita que um sobrescreva o outro
+                nome = f"{hashlib.sha256(item['conteudo']).hexdigest()[:16]}_{item['nome']}"
+                # Mesma regra da interface de upload: sem S3, guarda-se uma referência local
+                chave_s3 = salvar_arquivo_s3(f"fichas_excel/{nome}", item['conteudo'])
+                item['dados']['arquivo_s3'] = chave_s3 or f"local_fichas_{nome}"
+                fila_banco.put(item['dados'])
+            except Exception as e:
+                with trava:
+                    estatisticas['falhas_upload'] += 1
+                    estatisticas['erros'].append({'arquivo': item['caminho'], 'erro': str(e)})
+    finally:
+        fila_banco.put(_FIM)
+
+def _estagio_banco(fila_banco, estatisticas, trava, produtores, tamanho_lote_banco):
+    """Insere as fichas no banco em lotes (um executemany/COPY por lote)"""
+    from src.database.crud_operations import inserir_lote_banco
+    
+    pendentes = []
+    
+    def gravar():
+        if not pendentes:
+            return
+        resultado = inserir_lote_banco(list(pendentes))
+        with trava:
+            if resultado is None:
+                estatisticas['lotes_banco_com_falha'] += 1
+                estatisticas['fichas_rejeitadas'] += len(pendentes)
+            else:
+                estatisticas['fichas_inseridas'] += resultado['inseridos']
+                estatisticas['fichas_duplicadas'] += resultado['duplicados']
+                estatisticas['fichas_rejeitadas'] += resultado['rejeitados']
+                for dados, item in zip(pendentes, resultado['resultados']):
+                    if item['status'] == 'rejeitado':
+                        estatisticas['erros'].append({'arquivo': dados['arquivo_s3'], 'erro': item['mensagem']})
+        pendentes.clear()
+    
+    fins = 0
+    while fins < produtores:
+        dados = fila_banco.get()
+        if dados is _FIM:
+            fins += 1
+            continue
+        pendentes.append(dados)
+        if len(pendentes) >= tamanho_lote_banco:
+            gravar()
+    gravar()
+
+def executar_ingestao(caminhos, tamanho_lote=32, max_workers=None, threads_upload=4,
+                      tamanho_fila=64, tamanho_lote_banco=200):
+    """Executa extração -> upload S3 -> inserção no banco como estágios concorrentes com filas limitadas
+    
+    Retorna as estatísticas da execução, incluindo a vazão (arquivos/s e MB/s).
+    """
+    estatisticas = _novas_estatisticas()
+    trava = threading.Lock()
+    fila_upload = queue.Queue(maxsize=tamanho_fila)
+    fila_banco = queue.Queue(maxsize=tamanho_fila)
+    
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESSOS) as executor:
+        threads = [threading.Thread(
+            target=_estagio_extracao,
+            args=(caminhos, fila_upload, estatisticas, trava, tamanho_lote, executor, threads_upload),
+            name='ingestao-extracao'
+        )]
+        threads += [
+            threading.Thread(target=_estagio_upload, args=(fila_upload, fila_banco, estatisticas, trava),
+                             name=f'ingestao-upload-{n}')
+            for n in range(threads_upload)
+        ]
+        threads.append(threading.Thread(
+            target=_estagio_banco,
+            args=(fila_banco, estatisticas, trava, threads_upload, tamanho_lote_banco),
+            name='ingestao-banco'
+        ))
+        
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    
+    duracao = time.perf_counter() - inicio
+    estatisticas['duracao_s'] = round(duracao, 3)
+    estatisticas['arquivos_por_s'] = round(estatisticas['arquivos'] / duracao, 2) if duracao else 0.0
+    estatisticas['mb_por_s'] = round(estatisticas['bytes'] / 1024 / 1024 / duracao, 2) if duracao else 0.0
+    return estatisticas
+
+def formatar_resumo(estatisticas):
+    """Resumo legível da execução"""
+    return "\n".join([
+        f"Arquivos lidos: {estatisticas['arquivos']} ({estatisticas['bytes'] / 1024 / 1024:.1f} MB)",
+        f"Fichas extraídas: {estatisticas['fichas_extraidas']} | PDFs enviados: {estatisticas['pdfs']}",
+        f"Banco - inseridas: {estatisticas['fichas_inseridas']}, duplicadas: {estatisticas['fichas_duplicadas']}, "
+        f"rejeitadas: {estatisticas['fichas_rejeitadas']} (lotes com falha: {estatisticas['lotes_banco_com_falha']})",
+        f"Falhas - leitura: {estatisticas['falhas_leitura']}, extração: {estatisticas['falhas_extracao']}, "
+        f"upload: {estatisticas['falhas_upload']}",
+        f"Tempo: {estatisticas['duracao_s']:.1f}s | Vazão: {estatisticas['arquivos_por_s']:.1f} arquivos/s, "
+        f"{estatisticas['mb_por_s']:.2f} MB/s",
+    ])
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão em massa de fichas Excel e relatórios PDF, sem Streamlit")
+    parser.add_argument('origem', help="Diretório com os arquivos ou manifesto (um caminho por linha)")
+    parser.add_argument('--lote', type=int, default=32, help="Arquivos por lote de extração")
+    parser.add_argument('--workers', type=int, default=None, help="Processos de extração")
+    parser.add_argument('--uploads', type=int, default=4, help="Uploads simultâneos para o S3")
+    parser.add_argument('--fila', type=int, default=64, help="Tamanho máximo das filas entre estágios")
+    parser.add_argument('--lote-banco', type=int, default=200, help="Fichas por inserção no banco")
+    parser.add_argument('--json', action='store_true', help="Imprime as estatísticas em JSON")
+    args = parser.parse_args()
+    
+    # Fora do `streamlit run` as chamadas st.* só geram avisos de contexto; os erros vão para o resumo
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+    
+    caminhos = listar_entradas(args.origem)
+    if not caminhos:
+        print("Nenhuma ficha (.xls/.xlsx) ou PDF encontrado", file=sys.stderr)
+        sys.exit(1)
+    
+    estatisticas = executar_ingestao(
+        caminhos,
+        tamanho_lote=args.lote,
+        max_workers=args.workers,
+        threads_upload=args.uploads,
+        tamanho_fila=args.fila,
+        tamanho_lote_banco=args.lote_banco
+    )
+    
+    if args.json:
+        print(json.dumps(estatisticas, ensure_ascii=False, default=str))
+    else:
+        print(formatar_resumo(estatisticas))
+        for erro in estatisticas['erros'][:20]:
+            print(f"  - {erro['arquivo']}: {erro['erro']}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
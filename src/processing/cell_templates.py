@@ -0,0 +1,146 @@
+import hashlib
+from src.processing.batch_normalizer import CONVERSORES
+
+# Células da ficha: campo -> (linha, coluna, conversor) - índices base 0, como no DataFrame
+# APENAS CAMPOS SEGUROS - REMOVIDOS: reparos, reformas, tipo_junta, tipo_AA, terapias
+CELULAS_FICHA_PADRAO = {
+    'concessionaria': (1, 1, 'texto'),
+    'rodovia': (4, 1, 'texto'),
+    'obra': (6, 1, 'texto'),
+    'sentido': (4, 5, 'texto'),
+    'km': (6, 5, 'km'),
+    'ic': (10, 1, 'texto'),
+    'uir': (10, 3, 'texto'),
+    'uie': (10, 5, 'texto'),
+    'data_inspecao': (1, 13, 'data'),
+    'ano_inspecao': (0, 1, 'ano'),
+    'codigo': (0, 13, 'texto'),
+    'codigo_artesp': (2, 13, 'texto'),
+    'tipo_pav': (4, 8, 'texto'),
+    'estrutural': (52, 8, 'classificacao'),
+    'funcional': (52, 10, 'classificacao'),
+    'durabilidade': (52, 12, 'classificacao'),
+}
+
+CAMPOS_ASSINATURA = ['estrutural', 'funcional', 'durabilidade', 'codigo_artesp']
+
+def _codigos_classificacao(valores):
+    return [valores[campo] for campo in ('estrutural', 'funcional', 'durabilidade') if valores.get(campo)]
+
+def _assinatura_artesp(valores):
+    """Ficha ARTESP: códigos C0..A5, ou código ARTESP preenchido quando não há classificação"""
+    from src.database.models import CLASSIFICACOES_ARTESP
+    
+    codigos = _codigos_classificacao(valores)
+    if codigos:
+        return all(codigo.upper() in CLASSIFICACOES_ARTESP for codigo in codigos)
+    return bool(valores.get('codigo_artesp'))
+
+def _assinatura_antt(valores):
+    """Ficha ANTT: classificações numéricas 0..5"""
+    from src.database.models import CLASSIFICACOES_ANTT
+    
+    codigos = _codigos_classificacao(valores)
+    return bool(codigos) and all(codigo in CLASSIFICACOES_ANTT for codigo in codigos)
+
+# Registro de layouts, na ordem de teste das assinaturas.
+# Incrementar 'versao' sempre que as células ou conversores de um layout mudarem (invalida o cache)
+TEMPLATES_FICHA = {
+    'ARTESP': {
+        'versao': 1,
+        'orgao_regulador': 'ARTESP',
+        'celulas': CELULAS_FICHA_PADRAO,
+        'campos_assinatura': CAMPOS_ASSINATURA,
+        'assinatura': _assinatura_artesp,
+    },
+    # As fichas ANTT recebidas até agora usam as mesmas coordenadas; ajustar aqui quando divergirem
+    'ANTT': {
+        'versao': 1,
+        'orgao_regulador': 'ANTT',
+        'celulas': CELULAS_FICHA_PADRAO,
+        'campos_assinatura': CAMPOS_ASSINATURA,
+        'assinatura': _assinatura_antt,
+    },
+}
+
+# Layout usado quando nenhuma assinatura confere (padrão de obter_opcoes_classificacao)
+NOME_TEMPLATE_PADRAO = 'ARTESP'
+
+def compilar_plano_leitura(mapa_celulas):
+    """Converte um mapa nome -> (linha, coluna) em um plano mínimo de leitura (linhas necessárias e limites)"""
+    linhas = {}
+    for nome, (linha, coluna) in mapa_celulas.items():
+        linhas.setdefault(linha, []).append((coluna, nome))
+    
+    return {
+        'campos': list(mapa_celulas.keys()),
+        'linhas': {linha: sorted(celulas) for linha, celulas in linhas.items()},
+        'min_linha': min(linhas),
+        'max_linha': max(linhas),
+        'max_coluna': max(coluna for _, coluna in mapa_celulas.values()),
+    }
+
+def compilar_template(nome, definicao):
+    """Pré-computa as entradas (linha, coluna, campo, conversor) e a caixa delimitadora de um layout"""
+    entradas = []
+    for campo, (linha, coluna, conversor) in definicao['celulas'].items():
+        if conversor not in CONVERSORES:
+            raise ValueError(f"Conversor desconhecido '{conversor}' no campo {campo} do template {nome}")
+        entradas.append((linha, coluna, campo, conversor))
+    
+    posicoes = {campo: (linha, coluna) for linha, coluna, campo, _ in entradas}
+    
+    return {
+        'nome': nome,
+        'versao': definicao['versao'],
+        'orgao_regulador': definicao['orgao_regulador'],
+        'entradas': entradas,
+        'posicoes': posicoes,
+        'tipos_campos': {campo: conversor for _, _, campo, conversor in entradas},
+        'caixa': (max(linha for linha, _, _, _ in entradas), max(coluna for _, coluna, _, _ in entradas)),
+        'posicoes_assinatura': {campo: posicoes[campo] for campo in definicao['campos_assinatura']},
+        'assinatura': definicao['assinatura'],
+    }
+
+TEMPLATES_COMPILADOS = [compilar_template(nome, definicao) for nome, definicao in TEMPLATES_FICHA.items()]
+TEMPLATE_PADRAO = next(t for t in TEMPLATES_COMPILADOS if t['nome'] == NOME_TEMPLATE_PADRAO)
+
+def _unificar_tipos(templates):
+    tipos = {}
+    for template in templates:
+        for campo, conversor in template['tipos_campos'].items():
+            if tipos.setdefault(campo, conversor) != conversor:
+                raise ValueError(f"Campo {campo} com conversores diferentes entre templates")
+    return tipos
+
+# Tipos por campo, comuns a todos os layouts (a normalização em lote é uma só)
+TIPOS_CAMPOS = _unificar_tipos(TEMPLATES_COMPILADOS)
+
+# Planos de leitura unificados, indexados por posição: uma única passada serve a qualquer layout
+PLANO_EXTRACAO = compilar_plano_leitura({
+    (linha, coluna): (linha, coluna)
+    for template in TEMPLATES_COMPILADOS
+    for linha, coluna, _, _ in template['entradas']
+})
+PLANO_SONDA = compilar_plano_leitura({
+    posicao: posicao
+    for template in TEMPLATES_COMPILADOS
+    for posicao in list(template['posicoes_assinatura'].values()) + [template['posicoes']['concessionaria']]
+})
+
+# Versão do registro (entra na chave do cache): muda quando qualquer layout muda
+VERSAO_TEMPLATES = '+'.join(f"{t['nome']}.v{t['versao']}" for t in TEMPLATES_COMPILADOS) + '-' + hashlib.sha256(
+    repr([(t['nome'], t['entradas']) for t in TEMPLATES_COMPILADOS]).encode()
+).hexdigest()[:8]
+
+def selecionar_template(celulas):
+    """Escolhe o layout pelas células de assinatura ({(linha, coluna): valor}); None se nenhum conferir"""
+    for template in TEMPLATES_COMPILADOS:
+        valores = {campo: celulas.get(posicao) for campo, posicao in template['posicoes_assinatura'].items()}
+        if template['assinatura'](valores):
+            return template
+    return None
+
+def aplicar_template(template, celulas):
+    """Mapeia as células lidas ({(linha, coluna): valor}) para os campos do layout"""
+    return {campo: celulas.get((linha, coluna)) for linha, coluna, campo, _ in template['entradas']}
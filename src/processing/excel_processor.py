@@ -1,6 +1,21 @@
+import threading
+import multiprocessing
 import streamlit as st
 import pandas as pd
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from src.processing.parse_cache import calcular_chave_cache, obter_do_cache, salvar_no_cache
+from src.processing.batch_normalizer import normalizar_lote
+from src.processing.cell_templates import (
+    PLANO_EXTRACAO,
+    PLANO_SONDA,
+    TEMPLATE_PADRAO,
+    TIPOS_CAMPOS,
+    VERSAO_TEMPLATES,
+    aplicar_template,
+    selecionar_template
+)
 
 def obter_valor_celula(df, linha, coluna):
     """Obtém valor de uma célula específica do DataFrame"""
@@ -13,74 +28,301 @@ def obter_valor_celula(df, linha, coluna):
     except Exception:
         return None
 
-def ler_dados_excel(arquivo):
-    """Lê dados específicos de um arquivo Excel - versão simplificada SEM campos problemáticos"""
+# Assinaturas binárias: .xlsx é um zip (OOXML), .xls é um documento OLE2 (BIFF)
+ASSINATURA_XLSX = b'PK\x03\x04'
+ASSINATURA_XLS = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+def normalizar_valor_celula(valor):
+    """Normaliza o valor bruto de uma célula do mesmo modo que obter_valor_celula"""
+    if valor is None or valor == '':
+        return None
+    # Números inteiros são gravados sem ".0" ('3', não '3.0'); fichas gravadas antes pela leitura via
+    # pandas (que devolvia '3.0' em colunas numéricas) são reescritas pela migração 7
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+def obter_bytes_arquivo(arquivo):
+    """Obtém o conteúdo em bytes de um upload, caminho ou buffer"""
+    if isinstance(arquivo, (bytes, bytearray)):
+        return bytes(arquivo)
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        return arquivo.read()
+    with open(arquivo, 'rb') as f:
+        return f.read()
+
+def ler_celulas_xlsx(conteudo, plano=PLANO_EXTRACAO):
+    """Lê apenas as células do plano, em streaming, parando após a última linha necessária"""
+    from openpyxl import load_workbook
+    
+    wb = load_workbook(BytesIO(conteudo), read_only=True, data_only=True, keep_links=False)
     try:
-        if hasattr(arquivo, 'read'):
-            arquivo.seek(0)
-            arquivo_bytes = BytesIO(arquivo.read())
-        else:
-            arquivo_bytes = arquivo
-            
-        df = pd.read_excel(arquivo_bytes, sheet_name=0, header=None, engine='openpyxl')
+        ws = wb.worksheets[0]
+        valores = {campo: None for campo in plano['campos']}
         
-        # Mapeamento das células - APENAS CAMPOS SEGUROS
-        dados = {
-            'concessionaria': obter_valor_celula(df, 1, 1),
-            'rodovia': obter_valor_celula(df, 4, 1),
-            'obra': obter_valor_celula(df, 6, 1),
-            'sentido': obter_valor_celula(df, 4, 5),
-            'km': obter_valor_celula(df, 6, 5),
-            'ic': obter_valor_celula(df, 10, 1),
-            'uir': obter_valor_celula(df, 10, 3),
-            'uie': obter_valor_celula(df, 10, 5),
-            'data_inspecao': obter_valor_celula(df, 1, 13),
-            'ano_inspecao': obter_valor_celula(df, 0, 1),
-            'codigo': obter_valor_celula(df, 0, 13),
-            'codigo_artesp': obter_valor_celula(df, 2, 13),
-            'tipo_pav': obter_valor_celula(df, 4, 8),
-            'estrutural': obter_valor_celula(df, 52, 8),
-            'funcional': obter_valor_celula(df, 52, 10),
-            'durabilidade': obter_valor_celula(df, 52, 12),
-            # REMOVIDOS: reparos, reformas, tipo_junta, tipo_AA, terapias
-        }
+        linhas = ws.iter_rows(
+            min_row=plano['min_linha'] + 1,
+            max_row=plano['max_linha'] + 1,
+            max_col=plano['max_coluna'] + 1,
+            values_only=True
+        )
+        for indice, linha in enumerate(linhas, start=plano['min_linha']):
+            for coluna, campo in plano['linhas'].get(indice, ()):
+                if coluna < len(linha):
+                    valores[campo] = normalizar_valor_celula(linha[coluna])
         
-        # Processar data_inspecao
-        if dados['data_inspecao'] and pd.notna(dados['data_inspecao']):
-            try:
-                dados['data_inspecao'] = pd.to_datetime(dados['data_inspecao']).date()
-            except:
-                dados['data_inspecao'] = None
+        return valores
+    finally:
+        wb.close()
+
+def _valor_celula_xls(book, celula):
+    """Converte uma célula xlrd para o mesmo valor bruto que o openpyxl entregaria"""
+    import xlrd
+    
+    if celula.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+        return None
+    if celula.ctype == xlrd.XL_CELL_DATE:
+        return xlrd.xldate.xldate_as_datetime(celula.value, book.datemode)
+    if celula.ctype == xlrd.XL_CELL_BOOLEAN:
+        return bool(celula.value)
+    return celula.value
+
+def ler_celulas_xls(conteudo, plano=PLANO_EXTRACAO):
+    """Lê as células do plano de um .xls (BIFF) com xlrd, carregando apenas a primeira planilha"""
+    import xlrd
+    
+    book = xlrd.open_workbook(file_contents=conteudo, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        valores = {campo: None for campo in plano['campos']}
         
-        # Processar ano_inspecao
-        if dados['ano_inspecao']:
-            try:
-                dados['ano_inspecao'] = int(float(dados['ano_inspecao']))
-            except:
-                dados['ano_inspecao'] = None
+        for linha, celulas in plano['linhas'].items():
+            if linha >= sheet.nrows:
+                continue
+            for coluna, campo in celulas:
+                if coluna < sheet.row_len(linha):
+                    valores[campo] = normalizar_valor_celula(_valor_celula_xls(book, sheet.cell(linha, coluna)))
+        
+        return valores
+    finally:
+        book.release_resources()
+
+def detectar_formato(conteudo):
+    """Identifica o formato pelo conteúdo (não pela extensão): 'xlsx', 'xls' ou None"""
+    if conteudo.startswith(ASSINATURA_XLSX):
+        return 'xlsx'
+    if conteudo.startswith(ASSINATURA_XLS):
+        return 'xls'
+    return None
+
+def ler_celulas(conteudo, plano=PLANO_EXTRACAO, formato=None):
+    """Lê as células do plano usando o leitor adequado ao formato do arquivo"""
+    formato = formato or detectar_formato(conteudo)
+    if formato == 'xlsx':
+        return ler_celulas_xlsx(conteudo, plano)
+    if formato == 'xls':
+        return ler_celulas_xls(conteudo, plano)
+    raise ValueError("Arquivo não é uma planilha Excel (.xls/.xlsx)")
+
+def sondar_arquivo_excel(arquivo):
+    """Classifica um arquivo lendo só as células de assinatura, sem a extração completa
+    
+    Retorna {'valido', 'formato', 'layout', 'concessionaria', 'erro'}.
+    """
+    resultado = {'valido': False, 'formato': None, 'layout': None, 'concessionaria': None, 'erro': None}
+    
+    try:
+        conteudo = obter_bytes_arquivo(arquivo)
+        resultado['formato'] = detectar_formato(conteudo)
         
-        return dados
+        celulas = ler_celulas(conteudo, PLANO_SONDA, resultado['formato'])
+        template = selecionar_template(celulas)
+        posicao_concessionaria = (template or TEMPLATE_PADRAO)['posicoes']['concessionaria']
+        
+        resultado['concessionaria'] = celulas.get(posicao_concessionaria)
+        resultado['layout'] = template['nome'] if template else None
+        resultado['valido'] = bool(resultado['concessionaria'])
+    except Exception as e:
+        resultado['erro'] = str(e)
+    
+    return resultado
+
+def pos_processar_dados(dados):
+    """Converte data_inspecao, ano_inspecao, km e classificações extraídos das células"""
+    return normalizar_lote([dados], TIPOS_CAMPOS)[0]
+
+def extrair_celulas_ficha(conteudo):
+    """Lê as células brutas (texto ou None) de uma ficha e as mapeia pelo layout detectado, sem cache"""
+    # Uma única passada lê a caixa de todos os layouts; a assinatura escolhe o template
+    celulas = ler_celulas(conteudo, PLANO_EXTRACAO)
+    template = selecionar_template(celulas)
+    
+    dados = aplicar_template(template or TEMPLATE_PADRAO, celulas)
+    dados['orgao_regulador'] = template['orgao_regulador'] if template else None
+    return dados
+
+def obter_celulas_ficha(conteudo, usar_cache=True):
+    """Lê as células brutas de uma ficha, passando pelo cache por conteúdo"""
+    if not usar_cache:
+        return extrair_celulas_ficha(conteudo)
+    
+    chave = calcular_chave_cache(conteudo, VERSAO_TEMPLATES)
+    celulas = obter_do_cache(chave)
+    if celulas is None:
+        celulas = extrair_celulas_ficha(conteudo)
+        salvar_no_cache(chave, celulas)
+    
+    return celulas
+
+def extrair_dados_ficha(conteudo, usar_cache=True):
+    """Extrai os dados de uma ficha a partir dos bytes do arquivo (sem Streamlit, lança exceções)"""
+    return pos_processar_dados(obter_celulas_ficha(conteudo, usar_cache))
+
+def ler_dados_excel(arquivo):
+    """Lê dados específicos de um arquivo Excel - versão simplificada SEM campos problemáticos"""
+    try:
+        return extrair_dados_ficha(obter_bytes_arquivo(arquivo))
     except Exception as e:
         st.error(f"Erro ao processar arquivo: {str(e)}")
         return None
 
 def validar_arquivo_excel(arquivo):
-    """Valida se o arquivo Excel tem o formato esperado"""
+    """Valida se o arquivo Excel tem o formato esperado (via sonda, sem extração completa)"""
     try:
-        dados = ler_dados_excel(arquivo)
-        if dados and dados.get('concessionaria'):
-            return True
-        return False
+        return sondar_arquivo_excel(arquivo)['valido']
     except:
         return False
 
-def processar_multiplos_arquivos(arquivos):
-    """Processa múltiplos arquivos Excel"""
-    dados_processados = []
+def processar_multiplos_arquivos(arquivos, paralelo=False, max_workers=None):
+    """Processa múltiplos arquivos Excel (opcionalmente em paralelo, via pool de processos)"""
+    if paralelo:
+        dados_processados = []
+        for resultado in processar_lote_paralelo(arquivos, max_workers=max_workers):
+            if resultado['erro']:
+                st.error(f"Erro ao processar arquivo {resultado['nome']}: {resultado['erro']['mensagem']}")
+            elif resultado['dados']:
+                dados_processados.append(resultado['dados'])
+        return dados_processados
+    
+    celulas_lote = []
     
     for arquivo in arquivos:
-        dados = ler_dados_excel(arquivo)
-        if dados:
-            dados_processados.append(dados)
+        try:
+            celulas_lote.append(obter_celulas_ficha(obter_bytes_arquivo(arquivo)))
+        except Exception as e:
+            st.error(f"Erro ao processar arquivo: {str(e)}")
+    
+    # Conversões de tipo em uma única passada sobre o lote inteiro
+    return normalizar_lote(celulas_lote, TIPOS_CAMPOS)
+
+def _extrair_em_processo(conteudo):
+    """Executada nos processos do pool: devolve (celulas, erro) em vez de chamar st.error"""
+    try:
+        return extrair_celulas_ficha(conteudo), None
+    except Exception as e:
+        return None, {'tipo': type(e).__name__, 'mensagem': str(e)}
+
+# Processos do pool iniciados por 'spawn': o servidor do Streamlit tem várias threads, e um fork feito
+# enquanto outra thread segura uma trava pode deixar o processo filho travado para sempre
+CONTEXTO_PROCESSOS = multiprocessing.get_context('spawn')
+
+# Pools reaproveitados entre uploads (um por max_workers), criados no primeiro lote que precisar
+_pools = {}
+_trava_pools = threading.Lock()
+
+def _pool_compartilhado(max_workers):
+    with _trava_pools:
+        if max_workers not in _pools:
+            _pools[max_workers] = ProcessPoolExecutor(max_workers=max_workers, mp_context=CONTEXTO_PROCESSOS)
+        return _pools[max_workers]
+
+def _descartar_pool(pool):
+    """Pool quebrado (um processo morreu): o próximo lote cria outro"""
+    with _trava_pools:
+        for chave, atual in list(_pools.items()):
+            if atual is pool:
+                del _pools[chave]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def processar_lote_paralelo(arquivos, max_workers=None, callback_progresso=None, executor=None):
+    """Extrai fichas em um pool de processos, devolvendo um resultado por arquivo na ordem de entrada
+    
+    Cada resultado é um dict {'nome', 'dados', 'erro'}; 'erro' é None ou {'tipo', 'mensagem'}.
+    callback_progresso(concluidos, total) é chamado no processo principal a cada arquivo concluído.
+    executor permite usar um ProcessPoolExecutor do chamador (não é encerrado aqui); sem ele, os lotes
+    usam um pool do processo, criado uma vez e reaproveitado.
+    """
+    total = len(arquivos)
+    resultados = [None] * total
+    conteudos = []
+    
+    for i, arquivo in enumerate(arquivos):
+        nome = getattr(arquivo, 'name', f'arquivo_{i + 1}')
+        resultados[i] = {'nome': nome, 'dados': None, 'erro': None}
+        try:
+            conteudos.append(obter_bytes_arquivo(arquivo))
+        except Exception as e:
+            conteudos.append(None)
+            resultados[i]['erro'] = {'tipo': type(e).__name__, 'mensagem': str(e)}
+    
+    # Arquivos já extraídos antes (mesmo conteúdo) saem direto do cache
+    chaves = [calcular_chave_cache(c, VERSAO_TEMPLATES) if c is not None else None for c in conteudos]
+    celulas_por_indice = {}
+    pendentes = []
+    concluidos = 0
+    for i in range(total):
+        if resultados[i]['erro'] is not None:
+            concluidos += 1
+            continue
+        celulas = obter_do_cache(chaves[i])
+        if celulas is None:
+            pendentes.append(i)
+        else:
+            celulas_por_indice[i] = celulas
+            concluidos += 1
+    
+    if concluidos and callback_progresso:
+        callback_progresso(concluidos, total)
+    
+    def registrar(i, celulas, erro):
+        if erro is None:
+            salvar_no_cache(chaves[i], celulas)
+            celulas_por_indice[i] = celulas
+        else:
+            resultados[i]['erro'] = erro
+    
+    def coletar(pool):
+        nonlocal concluidos
+        futuros = {pool.submit(_extrair_em_processo, conteudos[i]): i for i in pendentes}
+        for futuro in as_completed(futuros):
+            i = futuros[futuro]
+            try:
+                registrar(i, *futuro.result())
+            except Exception as e:
+                # Ex.: BrokenProcessPool se um processo do pool morrer
+                resultados[i]['erro'] = {'tipo': type(e).__name__, 'mensagem': str(e)}
+                if isinstance(e, BrokenProcessPool) and pool is not executor:
+                    _descartar_pool(pool)
+            concluidos += 1
+            if callback_progresso:
+                callback_progresso(concluidos, total)
+    
+    if executor is not None:
+        coletar(executor)
+    elif len(pendentes) <= 1 or max_workers == 1:
+        # Lotes pequenos não compensam o custo de subir processos
+        for i in pendentes:
+            registrar(i, *_extrair_em_processo(conteudos[i]))
+            concluidos += 1
+            if callback_progresso:
+                callback_progresso(concluidos, total)
+    else:
+        coletar(_pool_compartilhado(max_workers))
+    
+    # Conversões de tipo em uma única passada sobre o lote inteiro
+    indices = sorted(celulas_por_indice)
+    for i, dados in zip(indices, normalizar_lote([celulas_por_indice[i] for i in indices], TIPOS_CAMPOS)):
+        resultados[i]['dados'] = dados
     
-    return dados_processados
+    return resultados
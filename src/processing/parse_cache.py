@@ -0,0 +1,150 @@
+import os
+import json
+import sqlite3
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+
+# Camada persistente em SQLite local; FICHAS_CACHE_DB="" desativa a persistência
+CAMINHO_CACHE_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    '.cache', 'fichas_parse.sqlite3'
+)
+CAPACIDADE_LRU = int(os.environ.get('FICHAS_CACHE_LRU', '512'))
+# Limite de entradas da camada persistente: as mais antigas saem primeiro, conferido a cada N gravações
+CAPACIDADE_PERSISTENTE = int(os.environ.get('FICHAS_CACHE_MAX', '50000'))
+GRAVACOES_ENTRE_DESCARTES = 100
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_gravacoes = {'desde_descarte': 0}
+
+def calcular_chave_cache(conteudo, versao):
+    """Chave do cache: SHA-256 dos bytes do arquivo + versão do mapa de células"""
+    return f"{hashlib.sha256(conteudo).hexdigest()}:{versao}"
+
+def _caminho_cache():
+    return os.environ.get('FICHAS_CACHE_DB', CAMINHO_CACHE_PADRAO)
+
+def _conectar():
+    caminho = _caminho_cache()
+    if not caminho:
+        return None
+    
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    conn = sqlite3.connect(caminho, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parse_cache (
+            chave TEXT PRIMARY KEY,
+            dados TEXT NOT NULL,
+            criado_em TEXT NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS ix_parse_cache_criado_em ON parse_cache (criado_em)")
+    return conn
+
+def _guardar_lru(chave, dados):
+    with _lock:
+        _lru[chave] = dados
+        _lru.move_to_end(chave)
+        while len(_lru) > CAPACIDADE_LRU:
+            _lru.popitem(last=False)
+
+def _descartar_excedente(conn):
+    """Mantém só as CAPACIDADE_PERSISTENTE entradas mais recentes"""
+    conn.execute(
+        "DELETE FROM parse_cache WHERE criado_em < ("
+        "SELECT criado_em FROM parse_cache ORDER BY criado_em DESC LIMIT 1 OFFSET ?)",
+        (CAPACIDADE_PERSISTENTE - 1,)
+    )
+
+def _remover_persistente(chave):
+    try:
+        conn = _conectar()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute("DELETE FROM parse_cache WHERE chave = ?", (chave,))
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+def obter_do_cache(chave):
+    """Retorna uma cópia das células em cache (memória, depois SQLite) ou None"""
+    with _lock:
+        if chave in _lru:
+            _lru.move_to_end(chave)
+            return dict(_lru[chave])
+    
+    # O cache é apenas uma otimização: falhas na camada persistente são ignoradas
+    try:
+        conn = _conectar()
+        if conn is None:
+            return None
+        try:
+            linha = conn.execute("SELECT dados FROM parse_cache WHERE chave = ?", (chave,)).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    
+    if linha is None:
+        return None
+    
+    try:
+        dados = json.loads(linha[0])
+    except ValueError:
+        dados = None
+    if not isinstance(dados, dict):
+        # Linha corrompida ou truncada: vale como falta e é extraída de novo
+        _remover_persistente(chave)
+        return None
+    _guardar_lru(chave, dados)
+    return dict(dados)
+
+def salvar_no_cache(chave, dados):
+    """Guarda as células extraídas (valores texto ou None) nas duas camadas do cache"""
+    dados = dict(dados)
+    _guardar_lru(chave, dados)
+    with _lock:
+        _gravacoes['desde_descarte'] += 1
+        descartar = _gravacoes['desde_descarte'] >= GRAVACOES_ENTRE_DESCARTES
+        if descartar:
+            _gravacoes['desde_descarte'] = 0
+    
+    try:
+        conn = _conectar()
+        if conn is None:
+            return
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO parse_cache (chave, dados, criado_em) VALUES (?, ?, ?)",
+                    (chave, json.dumps(dados), datetime.datetime.now().isoformat())
+                )
+                if descartar:
+                    _descartar_excedente(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        pass
+
+def limpar_cache(persistente=False):
+    """Esvazia o cache em memória e, opcionalmente, o persistente"""
+    with _lock:
+        _lru.clear()
+    
+    if persistente:
+        try:
+            conn = _conectar()
+            if conn is not None:
+                try:
+                    with conn:
+                        conn.execute("DELETE FROM parse_cache")
+                finally:
+                    conn.close()
+        except sqlite3.Error:
+            pass
@@ -1,14 +1,19 @@
 import streamlit as st
-import pandas as pd
 import datetime
 from src.database.crud_operations import (
-    obter_todos_registros, 
+    obter_valores_distintos,
+    contar_registros,
+    resumir_registros,
     obter_registro_por_id,
     atualizar_registro,
     deletar_registro,
-    criar_novo_registro
+    criar_novo_registro,
+    buscar_registros_selecao,
+    LIMITE_SELECAO_PADRAO
 )
 from src.database.models import obter_opcoes_classificacao
+from src.ui.paginacao import exibir_tabela_paginada, exibir_resultados_busca
+from src.ui.exportacao import exibir_exportacao
 
 def crud_interface():
     st.header('🛠️ CRUD - Gerenciar Dados')
@@ -30,84 +35,57 @@ def crud_interface():
 def crud_read():
     st.subheader("👀 Visualizar Registros")
     
-    df = obter_todos_registros()
-    
-    if not df.empty:
-        # Filtros para busca
+    if contar_registros() > 0:
+        # Filtros para busca - opções via SELECT DISTINCT (em cache)
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            concessionarias = ["Todas"] + list(df['concessionaria'].dropna().unique())
+            concessionarias = ["Todas"] + obter_valores_distintos('concessionaria')
             concessionaria_filter = st.selectbox("Filtrar por Concessionária:", concessionarias)
         
         with col2:
-            anos = ["Todos"] + list(sorted(df['ano_inspecao'].dropna().unique()))
+            anos = ["Todos"] + obter_valores_distintos('ano_inspecao')
             ano_filter = st.selectbox("Filtrar por Ano:", anos)
         
         with col3:
-            rodovias = ["Todas"] + list(df['rodovia'].dropna().unique())
+            rodovias = ["Todas"] + obter_valores_distintos('rodovia')
             rodovia_filter = st.selectbox("Filtrar por Rodovia:", rodovias)
         
         with col4:
-            orgaos = ["Todos"] + list(df['orgao_regulador'].dropna().unique()) if 'orgao_regulador' in df.columns else ["Todos"]
+            orgaos = ["Todos"] + obter_valores_distintos('orgao_regulador')
             orgao_filter = st.selectbox("Filtrar por Órgão:", orgaos)
         
-        # Aplicar filtros
-        df_filtrado = df.copy()
-        if concessionaria_filter != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['concessionaria'] == concessionaria_filter]
-        if ano_filter != "Todos":
-            df_filtrado = df_filtrado[df_filtrado['ano_inspecao'] == ano_filter]
-        if rodovia_filter != "Todas":
-            df_filtrado = df_filtrado[df_filtrado['rodovia'] == rodovia_filter]
-        if orgao_filter != "Todos" and 'orgao_regulador' in df_filtrado.columns:
-            df_filtrado = df_filtrado[df_filtrado['orgao_regulador'] == orgao_filter]
+        # Filtros aplicados no banco ("Todas"/"Todos" = sem filtro)
+        filtros = {
+            'concessionaria': None if concessionaria_filter == "Todas" else concessionaria_filter,
+            'ano_inspecao': None if ano_filter == "Todos" else ano_filter,
+            'rodovia': None if rodovia_filter == "Todas" else rodovia_filter,
+            'orgao_regulador': None if orgao_filter == "Todos" else orgao_filter,
+        }
         
-        st.dataframe(df_filtrado, use_container_width=True)
+        termo_busca = st.text_input("🔎 Buscar por obra, tipo de pavimento ou código:", key="crud_read_busca")
         
-        # Downloads - CORRIGIDO PARA XLSX
-        if not df_filtrado.empty:
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Download CSV
-                csv = df_filtrado.to_csv(index=False)
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=csv,
-                    file_name=f"fichas_inspecao_{datetime.date.today()}.csv",
-                    mime="text/csv"
-                )
+        if termo_busca.strip():
+            # Busca textual no banco, dentro dos filtros acima
+            exibir_resultados_busca("crud_read_busca_resultados", termo_busca, filtros)
+        else:
+            total_filtrado = exibir_tabela_paginada("crud_read_grade", filtros)
             
-            with col2:
-                # Download XLSX - NOVO
-                from io import BytesIO
-                
-                # Criar arquivo Excel em memória
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_filtrado.to_excel(writer, index=False, sheet_name='Fichas_Inspecao')
-                
-                # Obter dados do arquivo
-                excel_data = output.getvalue()
-                
-                st.download_button(
-                    label="📊 Download XLSX",
-                    data=excel_data,
-                    file_name=f"fichas_inspecao_{datetime.date.today()}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            # Exportação sob demanda: o arquivo só é gerado quando pedido, lendo o banco em lotes
+            if total_filtrado:
+                exibir_exportacao("crud_read_exportacao", filtros)
         
         # Estatísticas
+        resumo = resumir_registros(filtros)
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total de Fichas", len(df_filtrado))
+            st.metric("Total de Fichas", resumo['total'])
         with col2:
-            st.metric("Concessionárias", df_filtrado['concessionaria'].nunique())
+            st.metric("Concessionárias", resumo['concessionarias'])
         with col3:
-            st.metric("Rodovias", df_filtrado['rodovia'].nunique())
+            st.metric("Rodovias", resumo['rodovias'])
         with col4:
-            st.metric("Anos", df_filtrado['ano_inspecao'].nunique())
+            st.metric("Anos", resumo['anos'])
     else:
         st.info("Nenhum registro encontrado")
 
@@ -193,18 +171,25 @@ def crud_create():
                     st.success("✅ Registro criado com sucesso!")
                     st.rerun()
 
+def _opcoes_registros(chave):
+    """Opções do seletor de fichas: busca no banco pelo termo digitado, em vez de listar a tabela inteira"""
+    termo = st.text_input("🔎 Buscar ficha (código, obra ou concessionária)", key=f"{chave}_busca")
+    opcoes = dict(buscar_registros_selecao(termo))
+    
+    if len(opcoes) == LIMITE_SELECAO_PADRAO:
+        st.caption(f"Mostrando as {LIMITE_SELECAO_PADRAO} primeiras fichas; refine a busca para ver outras")
+    return opcoes
+
 def crud_update():
     st.subheader("✏️ Atualizar Registro")
     
-    df = obter_todos_registros()
+    opcoes = _opcoes_registros("crud_update")
     
-    if not df.empty:
+    if opcoes:
         # Seleção do registro
-        registro_opcoes = [f"ID {row['id']} - {row['codigo']} - {row['concessionaria']}" for _, row in df.iterrows()]
-        registro_selecionado = st.selectbox("Selecione o registro para atualizar:", registro_opcoes)
+        registro_id = st.selectbox("Selecione o registro para atualizar:", list(opcoes), format_func=opcoes.get)
         
-        if registro_selecionado:
-            registro_id = int(registro_selecionado.split(" - ")[0].replace("ID ", ""))
+        if registro_id is not None:
             registro_atual = obter_registro_por_id(registro_id)
             
             if registro_atual:
@@ -263,15 +248,13 @@ def crud_update():
 def crud_delete():
     st.subheader("🗑️ Deletar Registro")
     
-    df = obter_todos_registros()
+    opcoes = _opcoes_registros("crud_delete")
     
-    if not df.empty:
+    if opcoes:
         # Seleção do registro
-        registro_opcoes = [f"ID {row['id']} - {row['codigo']} - {row['concessionaria']}" for _, row in df.iterrows()]
-        registro_selecionado = st.selectbox("Selecione o registro para deletar:", registro_opcoes)
+        registro_id = st.selectbox("Selecione o registro para deletar:", list(opcoes), format_func=opcoes.get)
         
-        if registro_selecionado:
-            registro_id = int(registro_selecionado.split(" - ")[0].replace("ID ", ""))
+        if registro_id is not None:
             registro = obter_registro_por_id(registro_id)
             
             if registro:
@@ -0,0 +1,72 @@
+import os
+import streamlit as st
+from src.database.exportacao import gerar_exportacao, formatos_disponiveis
+from src.aws.s3_handler import publicar_arquivo_s3, gerar_url_download_s3
+from utils.config import get_s3_client, get_s3_bucket
+
+ROTULOS_FORMATOS = {'csv': "CSV", 'xlsx': "Excel (XLSX)", 'parquet': "Parquet"}
+
+@st.cache_resource
+def _s3_configurado():
+    """Verificado uma vez por processo (e não a cada rerun): monta um cliente boto3"""
+    return bool(get_s3_client() and get_s3_bucket())
+
+def _remover_arquivo(estado):
+    caminho = estado.get('caminho')
+    if caminho and os.path.exists(caminho):
+        os.remove(caminho)
+    estado['caminho'] = None
+
+def exibir_exportacao(chave, filtros=None, colunas=None):
+    """Exportação das fichas filtradas, gerada só quando pedida (lendo o banco em lotes)
+    
+    O último arquivo gerado fica em memória em st.session_state[chave] até os filtros mudarem (o
+    arquivo temporário é apagado logo após a geração, então sessões abandonadas não deixam nada em
+    disco); com S3 configurado, pode ser publicado no bucket e baixado por um link pré-assinado.
+    """
+    estado = st.session_state.setdefault(chave, {})
+    assinatura = repr((sorted((filtros or {}).items()), colunas))
+    if estado.get('assinatura') != assinatura:
+        estado.clear()
+        estado['assinatura'] = assinatura
+    
+    with st.expander("📦 Exportar fichas filtradas"):
+        formato = st.radio("Formato:", formatos_disponiveis(), format_func=ROTULOS_FORMATOS.get,
+                           horizontal=True, key=f"{chave}_formato")
+        publicar = st.checkbox("☁️ Publicar no S3 e gerar link de download", disabled=not _s3_configurado(),
+                               key=f"{chave}_s3")
+        
+        if st.button("⚙️ Gerar arquivo", key=f"{chave}_gerar"):
+            estado['url'] = None
+            estado['conteudo'] = None
+            try:
+                with st.spinner("Gerando arquivo..."):
+                    estado.update(gerar_exportacao(formato, filtros, colunas), formato=formato)
+                
+                if publicar:
+                    with st.spinner("Enviando ao S3..."):
+                        chave_s3 = publicar_arquivo_s3(estado['caminho'], estado['nome_arquivo'], estado['mime'])
+                    if chave_s3:
+                        estado['url'] = gerar_url_download_s3(chave_s3, nome_download=estado['nome_arquivo'])
+                
+                if not estado['url']:
+                    with open(estado['caminho'], 'rb') as arquivo:
+                        estado['conteudo'] = arquivo.read()
+            except Exception as e:
+                st.error(f"❌ Erro ao exportar: {str(e)}")
+                return
+            finally:
+                _remover_arquivo(estado)
+        
+        if estado.get('url'):
+            st.success(f"✅ {estado['linhas']} ficha(s) publicadas no S3 (link válido por 1 hora)")
+            st.link_button("📥 Baixar do S3", estado['url'])
+        elif estado.get('conteudo') is not None:
+            st.caption(f"{estado['linhas']} ficha(s) · {estado['tamanho'] / 1024:.0f} KB")
+            st.download_button(
+                label=f"📥 Download {ROTULOS_FORMATOS[estado['formato']]}",
+                data=estado['conteudo'],
+                file_name=estado['nome_arquivo'],
+                mime=estado['mime'],
+                key=f"{chave}_baixar"
+            )
@@ -0,0 +1,66 @@
+import math
+import streamlit as st
+from src.database.crud_operations import obter_pagina_registros, contar_registros, buscar_fichas, TAMANHO_PAGINA_PADRAO
+
+def exibir_tabela_paginada(chave, filtros=None, colunas=None, tamanho_pagina=TAMANHO_PAGINA_PADRAO):
+    """Exibe uma grade paginada no banco (só a página visível é carregada) e retorna o total filtrado
+    
+    Os cursores das páginas já visitadas ficam em st.session_state[chave] para permitir voltar;
+    mudar filtros, colunas ou tamanho recomeça da primeira página. O total é recontado a cada rerun
+    (a contagem passa pelo cache de consultas, invalidado por qualquer escrita).
+    """
+    estado = st.session_state.setdefault(chave, {'assinatura': None})
+    assinatura = repr((sorted((filtros or {}).items()), colunas, tamanho_pagina))
+    if estado['assinatura'] != assinatura:
+        estado.update(assinatura=assinatura, cursores=[None], pagina=0)
+    
+    pagina = obter_pagina_registros(tamanho_pagina, estado['cursores'][estado['pagina']], colunas, filtros)
+    total = contar_registros(filtros)
+    
+    st.dataframe(pagina['dados'], use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("◀ Anterior", key=f"{chave}_anterior", disabled=estado['pagina'] == 0):
+            estado['pagina'] -= 1
+            st.rerun()
+    with col2:
+        total_paginas = max(1, math.ceil(total / tamanho_pagina))
+        st.caption(f"Página {estado['pagina'] + 1} de {total_paginas} · {total} ficha(s)")
+    with col3:
+        if st.button("Próxima ▶", key=f"{chave}_proxima", disabled=pagina['proximo_cursor'] is None):
+            del estado['cursores'][estado['pagina'] + 1:]
+            estado['cursores'].append(pagina['proximo_cursor'])
+            estado['pagina'] += 1
+            st.rerun()
+    
+    return total
+
+def exibir_resultados_busca(chave, termo, filtros=None, colunas=None, tamanho_pagina=TAMANHO_PAGINA_PADRAO):
+    """Exibe os resultados da busca textual (mais relevantes primeiro), paginados por número de página
+    
+    A página atual fica em st.session_state[chave]; mudar termo, filtros, colunas ou tamanho volta à primeira.
+    """
+    estado = st.session_state.setdefault(chave, {'assinatura': None})
+    assinatura = repr((termo, sorted((filtros or {}).items()), colunas, tamanho_pagina))
+    if estado['assinatura'] != assinatura:
+        estado.update(assinatura=assinatura, pagina=1)
+    
+    resultado = buscar_fichas(termo, estado['pagina'], tamanho_pagina, colunas, filtros)
+    if resultado['dados'].empty and estado['pagina'] == 1:
+        st.info("Nenhuma ficha encontrada para a busca")
+        return
+    
+    st.dataframe(resultado['dados'].drop(columns=['relevancia']), use_container_width=True, hide_index=True)
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("◀ Anterior", key=f"{chave}_anterior", disabled=estado['pagina'] == 1):
+            estado['pagina'] -= 1
+            st.rerun()
+    with col2:
+        st.caption(f"Página {estado['pagina']} · resultados mais relevantes primeiro")
+    with col3:
+        if st.button("Próxima ▶", key=f"{chave}_proxima", disabled=not resultado['tem_proxima']):
+            estado['pagina'] += 1
+            st.rerun()
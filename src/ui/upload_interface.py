@@ -1,16 +1,19 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from src.processing.excel_processor import ler_dados_excel
+from src.processing.excel_processor import processar_lote_paralelo
 from src.aws.s3_handler import salvar_arquivo_s3
 from src.database.crud_operations import inserir_dados_banco, testar_conexao_banco
+from utils.config import obter_metricas_pool
 
 def upload_interface():
     st.header('📁 Upload de Arquivos')
     
     # Testar conexão com banco primeiro
     if st.button('🔍 Testar Conexão com Banco'):
-        testar_conexao_banco()
+        if testar_conexao_banco():
+            with st.expander("📈 Pool de conexões"):
+                st.json(obter_metricas_pool())
     
     st.divider()
     
@@ -74,14 +77,21 @@ def processar_arquivos_excel(uploaded_files):
     progress_bar = st.progress(0)
     dados_processados = []
     
-    for i, arquivo in enumerate(uploaded_files):
+    # Extração em paralelo (pool de processos); o progresso volta para a barra
+    def atualizar_progresso(concluidos, total):
+        progress_bar.progress(concluidos / total, text=f"Extraindo dados: {concluidos}/{total}")
+    
+    resultados = processar_lote_paralelo(uploaded_files, callback_progresso=atualizar_progresso)
+    
+    for i, (arquivo, resultado) in enumerate(zip(uploaded_files, resultados)):
         st.write(f"📄 Processando ficha: {arquivo.name}")
         
         try:
-            # Ler dados do Excel
-            dados = ler_dados_excel(arquivo)
+            dados = resultado['dados']
             
-            if dados:
+            if resultado['erro']:
+                st.error(f"❌ Erro ao processar {arquivo.name}: {resultado['erro']['mensagem']}")
+            elif dados:
                 st.write(f"✅ Dados extraídos de {arquivo.name}")
                 
                 # Salvar no S3 na pasta específica para fichas
@@ -104,7 +114,7 @@ def processar_arquivos_excel(uploaded_files):
         except Exception as e:
             st.error(f"❌ Erro ao processar {arquivo.name}: {str(e)}")
         
-        progress_bar.progress((i + 1) / len(uploaded_files))
+        progress_bar.progress((i + 1) / len(uploaded_files), text=f"Salvando fichas: {i + 1}/{len(uploaded_files)}")
     
     # Inserir fichas no banco
     if dados_processados:
@@ -325,11 +335,11 @@ def mostrar_estatisticas_upload():
     
     # Verificar dados existentes
     try:
-        from src.database.crud_operations import obter_todos_registros
-        df = obter_todos_registros()
+        from src.database.crud_operations import contar_registros
+        total_fichas = contar_registros(estimado=True)
         
-        if not df.empty:
-            st.success(f"✅ {len(df)} fichas já cadastradas no sistema")
+        if total_fichas:
+            st.success(f"✅ {total_fichas} fichas já cadastradas no sistema")
         else:
             st.info("ℹ️ Nenhuma ficha cadastrada ainda")
             
@@ -9,19 +9,20 @@ def visualizacao_interface():
     
     # Tentar carregar dados do banco
     try:
-        from src.database.crud_operations import obter_todos_registros
-        df = obter_todos_registros()
+        from src.database.crud_operations import contar_registros, obter_valores_distintos
+        from src.database.rollup import obter_contagens_dashboard
+        from src.ui.paginacao import exibir_tabela_paginada
         
-        if df.empty:
+        if contar_registros() == 0:
             st.warning("⚠️ Nenhum dado encontrado no banco de dados")
             st.info("Faça upload de alguns arquivos primeiro na seção 'Upload de Arquivos'")
             return
         
-        # Filtros - CORRIGIDO PARA INCLUIR DURABILIDADE
+        # Filtros - CORRIGIDO PARA INCLUIR DURABILIDADE (opções via SELECT DISTINCT)
         col1, col2, col3, col4 = st.columns(4)  # Mudança: 4 colunas em vez de 3
         
         with col1:
-            anos_disponiveis = sorted(df['ano_inspecao'].dropna().unique())
+            anos_disponiveis = obter_valores_distintos('ano_inspecao')
             if len(anos_disponiveis) > 0:
                 anos_selecionados = st.multiselect(
                     "Selecione os anos:",
@@ -32,7 +33,7 @@ def visualizacao_interface():
                 anos_selecionados = []
         
         with col2:
-            estrutural_options = df['estrutural'].dropna().unique()
+            estrutural_options = obter_valores_distintos('estrutural')
             estrutural_filter = st.multiselect(
                 "Classificação Estrutural:",
                 estrutural_options,
@@ -40,7 +41,7 @@ def visualizacao_interface():
             )
         
         with col3:
-            funcional_options = df['funcional'].dropna().unique()
+            funcional_options = obter_valores_distintos('funcional')
             funcional_filter = st.multiselect(
                 "Classificação Funcional:",
                 funcional_options,
@@ -48,32 +49,33 @@ def visualizacao_interface():
             )
         
         with col4:  # NOVA COLUNA PARA DURABILIDADE
-            durabilidade_options = df['durabilidade'].dropna().unique()
+            durabilidade_options = obter_valores_distintos('durabilidade')
             durabilidade_filter = st.multiselect(
                 "Classificação Durabilidade:",
                 durabilidade_options,
                 default=durabilidade_options
             )
         
-        # Aplicar filtros - INCLUINDO DURABILIDADE
-        df_filtrado = df.copy()
-        if anos_selecionados:
-            df_filtrado = df_filtrado[df_filtrado['ano_inspecao'].isin(anos_selecionados)]
-        if estrutural_filter:
-            df_filtrado = df_filtrado[df_filtrado['estrutural'].isin(estrutural_filter)]
-        if funcional_filter:
-            df_filtrado = df_filtrado[df_filtrado['funcional'].isin(funcional_filter)]
-        if durabilidade_filter:  # NOVO FILTRO
-            df_filtrado = df_filtrado[df_filtrado['durabilidade'].isin(durabilidade_filter)]
-        
-        if df_filtrado.empty:
+        # Filtros aplicados no banco - INCLUINDO DURABILIDADE (lista vazia = sem filtro)
+        filtros = {
+            'ano_inspecao': anos_selecionados,
+            'estrutural': estrutural_filter,
+            'funcional': funcional_filter,
+            'durabilidade': durabilidade_filter,
+        }
+        
+        # Contagens pré-agregadas (rollup), ou GROUP BY no banco para seleções parciais de classificação
+        dashboard = obter_contagens_dashboard(filtros)
+        contagens = dashboard['contagens']
+        resumo = dashboard['resumo']
+        if resumo['total'] == 0:
             st.warning("Nenhum dado encontrado com os filtros aplicados")
             return
         
         # Gráfico principal - Quantidade de fichas por ano
         st.subheader("📈 Quantidade de Fichas por Ano")
         
-        quantidade_por_ano = df_filtrado.groupby('ano_inspecao').size().reset_index(name='quantidade')
+        quantidade_por_ano = contagens['ano_inspecao']
         
         if not quantidade_por_ano.empty:
             fig = px.bar(
@@ -88,89 +90,63 @@ def visualizacao_interface():
         # Gráficos de classificações - TODOS OS TRÊS
         col1, col2, col3 = st.columns(3)
         
-        with col1:
-            st.subheader("🏗️ Classificação Estrutural")
-            estrutural_count = df_filtrado['estrutural'].value_counts()
-            if not estrutural_count.empty:
-                fig_estrutural = px.pie(
-                    values=estrutural_count.values,
-                    names=estrutural_count.index,
-                    title="Distribuição - Estrutural"
-                )
-                st.plotly_chart(fig_estrutural, use_container_width=True)
-            else:
-                st.info("Sem dados para exibir")
-        
-        with col2:
-            st.subheader("⚙️ Classificação Funcional")
-            funcional_count = df_filtrado['funcional'].value_counts()
-            if not funcional_count.empty:
-                fig_funcional = px.pie(
-                    values=funcional_count.values,
-                    names=funcional_count.index,
-                    title="Distribuição - Funcional"
-                )
-                st.plotly_chart(fig_funcional, use_container_width=True)
-            else:
-                st.info("Sem dados para exibir")
-        
-        with col3:
-            st.subheader("🔧 Classificação Durabilidade")
-            durabilidade_count = df_filtrado['durabilidade'].value_counts()
-            if not durabilidade_count.empty:
-                fig_durabilidade = px.pie(
-                    values=durabilidade_count.values,
-                    names=durabilidade_count.index,
-                    title="Distribuição - Durabilidade"
-                )
-                st.plotly_chart(fig_durabilidade, use_container_width=True)
-            else:
-                st.info("Sem dados para exibir")
+        for coluna_grafico, coluna, titulo, rotulo in [
+            (col1, 'estrutural', "🏗️ Classificação Estrutural", "Estrutural"),
+            (col2, 'funcional', "⚙️ Classificação Funcional", "Funcional"),
+            (col3, 'durabilidade', "🔧 Classificação Durabilidade", "Durabilidade"),
+        ]:
+            with coluna_grafico:
+                st.subheader(titulo)
+                contagem = contagens[coluna]
+                if not contagem.empty:
+                    fig_classificacao = px.pie(
+                        values=contagem['quantidade'],
+                        names=contagem[coluna],
+                        title=f"Distribuição - {rotulo}"
+                    )
+                    st.plotly_chart(fig_classificacao, use_container_width=True)
+                else:
+                    st.info("Sem dados para exibir")
         
         # Gráfico comparativo das três classificações
         st.subheader("📊 Comparação das Classificações")
         
-        # Criar DataFrame para comparação
-        classificacoes_data = []
-        for _, row in df_filtrado.iterrows():
-            classificacoes_data.extend([
-                {'Tipo': 'Estrutural', 'Classificação': row['estrutural'], 'Ficha': row['codigo']},
-                {'Tipo': 'Funcional', 'Classificação': row['funcional'], 'Ficha': row['codigo']},
-                {'Tipo': 'Durabilidade', 'Classificação': row['durabilidade'], 'Ficha': row['codigo']}
-            ])
-        
-        if classificacoes_data:
-            df_classificacoes = pd.DataFrame(classificacoes_data)
-            
+        df_classificacoes = pd.concat([
+            contagens[coluna].rename(columns={coluna: 'Classificação'}).assign(Tipo=rotulo)
+            for coluna, rotulo in [('estrutural', 'Estrutural'), ('funcional', 'Funcional'), ('durabilidade', 'Durabilidade')]
+        ], ignore_index=True)
+        
+        if not df_classificacoes.empty:
             # Gráfico de barras agrupadas
-            fig_comparacao = px.histogram(
+            fig_comparacao = px.bar(
                 df_classificacoes,
                 x='Classificação',
+                y='quantidade',
                 color='Tipo',
                 barmode='group',
                 title='Comparação entre Classificações',
-                labels={'count': 'Quantidade de Fichas'}
+                labels={'quantidade': 'Quantidade de Fichas'}
             )
             st.plotly_chart(fig_comparacao, use_container_width=True)
         
-        # Tabela de dados
+        # Tabela de dados - paginada no banco, com os mesmos filtros
         st.subheader("📋 Dados Detalhados")
-        st.dataframe(df_filtrado, use_container_width=True)
+        exibir_tabela_paginada("visualizacao_grade", filtros)
         
         # Estatísticas resumidas
         st.subheader("📊 Estatísticas Resumidas")
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total de Fichas", len(df_filtrado))
+            st.metric("Total de Fichas", resumo['total'])
         with col2:
-            st.metric("Concessionárias", df_filtrado['concessionaria'].nunique())
+            st.metric("Concessionárias", resumo['concessionarias'])
         with col3:
-            st.metric("Rodovias", df_filtrado['rodovia'].nunique())
+            st.metric("Rodovias", resumo['rodovias'])
         with col4:
-            anos_range = f"{df_filtrado['ano_inspecao'].min()}-{df_filtrado['ano_inspecao'].max()}" if len(df_filtrado) > 0 else "N/A"
+            anos_range = f"{resumo['ano_min']}-{resumo['ano_max']}" if resumo['ano_min'] is not None else "N/A"
             st.metric("Período", anos_range)
-        
+    
     except Exception as e:
         st.error(f"Erro ao carregar dados: {str(e)}")
         st.info("Funcionalidade de visualização temporariamente indisponível")
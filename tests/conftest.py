@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Banco SQLite descartável: configurado antes de importar o app (get_db_engine fica em cache no processo)
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='fichas_testes_'), 'fichas.sqlite3')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
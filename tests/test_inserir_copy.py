@@ -0,0 +1,61 @@
+import datetime
+from types import SimpleNamespace
+import pytest
+from sqlalchemy.exc import DataError
+from src.database import crud_operations
+
+class _ErroDriver(Exception):
+    """Base de exceções de um driver DBAPI (como psycopg2.Error)"""
+
+class DataErrorDriver(_ErroDriver):
+    """Como psycopg2.errors.StringDataRightTruncation, subclasse de psycopg2.DataError"""
+
+DataErrorDriver.__name__ = 'DataError'
+
+class _CursorCopyFalha:
+    def copy_expert(self, comando, buffer):
+        raise DataErrorDriver("value too long for type character varying(10)")
+    
+    def close(self):
+        pass
+
+def _conexao_copy_falha():
+    return SimpleNamespace(
+        execute=lambda *args, **kwargs: None,
+        connection=SimpleNamespace(cursor=_CursorCopyFalha),
+        dialect=SimpleNamespace(
+            loaded_dbapi=SimpleNamespace(Error=_ErroDriver),
+            dbapi_exception_translation_map={},
+        ),
+    )
+
+def _ficha(indice):
+    return {
+        'codigo': f'OAE-{indice}',
+        'data_inspecao': datetime.date(2024, 1, 1),
+        'concessionaria': 'CCR AutoBAn',
+        'rodovia': 'SP-330',
+        'km': f'{indice}+000',
+        'ano_inspecao': 2024,
+        'estrutural': 'C1',
+        'arquivo_s3': f'fichas_excel/{indice}.xlsx',
+    }
+
+def test_erro_do_driver_no_copy_vira_excecao_sqlalchemy():
+    linhas = crud_operations._linhas_insercao([_ficha(1)])
+    with pytest.raises(DataError) as erro:
+        crud_operations._inserir_copy(_conexao_copy_falha(), linhas)
+    assert isinstance(erro.value.orig, DataErrorDriver)
+
+def test_lote_com_copy_recusado_cai_na_insercao_ficha_a_ficha(monkeypatch):
+    inserir_copy = crud_operations._inserir_copy
+    
+    def copy_recusado(conn, linhas):
+        inserir_copy(_conexao_copy_falha(), linhas)
+    
+    monkeypatch.setattr(crud_operations, '_inserir_copy', copy_recusado)
+    resultado = crud_operations.inserir_lote_banco([_ficha(indice) for indice in range(3)], usar_copy=True)
+    
+    assert resultado is not None
+    assert resultado['inseridos'] == 3
+    assert [item['status'] for item in resultado['resultados']] == ['inserido'] * 3
@@ -3,19 +3,11 @@ Módulo de utilitários
 Contém configurações e funções auxiliares do sistema
 """
 
+# As credenciais são lidas de st.secrets dentro de config.py (não há constantes exportadas)
 from .config import (
     get_s3_client,
     get_db_engine,
-    get_s3_bucket,
-    AWS_ACCESS_KEY_ID,
-    AWS_SECRET_ACCESS_KEY,
-    AWS_S3_BUCKET,
-    AWS_REGION,
-    DB_USER,
-    DB_PASSWORD,
-    DB_HOST,
-    DB_PORT,
-    DB_NAME
+    get_s3_bucket
 )
 
 # Função para verificar configurações
@@ -1,57 +1,233 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 import streamlit as st
-from sqlalchemy import text
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.pool import QueuePool
+
+# Pool de conexões (sobrescrevíveis em st.secrets): dimensionar para as sessões simultâneas do Streamlit
+POOL_PADRAO = {
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_POOL_RECYCLE': 1800,  # abaixo do timeout de conexões ociosas do Postgres gerenciado
+    'DB_POOL_PRE_PING': True,
+}
+
+class QueuePoolInstrumentado(QueuePool):
+    """QueuePool que mede checkouts e o tempo de espera por uma conexão"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._trava_metricas = threading.Lock()
+        self.metricas = {
+            'checkouts': 0,
+            'espera_total_s': 0.0,
+            'espera_max_s': 0.0,
+            'timeouts': 0,
+            'conexoes_criadas': 0,
+        }
+        event.listen(self, 'connect', self._registrar_conexao)
+    
+    def _registrar_conexao(self, *_):
+        with self._trava_metricas:
+            self.metricas['conexoes_criadas'] += 1
+    
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conexao = super()._do_get()
+        except exc.TimeoutError:
+            self._registrar_espera(inicio, 'timeouts')
+            raise
+        self._registrar_espera(inicio, 'checkouts')
+        return conexao
+    
+    def _registrar_espera(self, inicio, contador):
+        espera = time.perf_counter() - inicio
+        with self._trava_metricas:
+            self.metricas[contador] += 1
+            self.metricas['espera_total_s'] += espera
+            self.metricas['espera_max_s'] = max(self.metricas['espera_max_s'], espera)
+
+# Backend de armazenamento (DB_BACKEND): 'postgres' (padrão) ou 'sqlite', um arquivo local para
+# instalações pequenas, uso offline e benchmarks. O schema e a API de crud_operations são os mesmos
+BACKENDS_BANCO = ('postgres', 'sqlite')
+CAMINHO_SQLITE_PADRAO = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dados', 'fichas.sqlite3'
+)
+
+def obter_configuracao(nome, padrao=None):
+    """Valor de st.secrets ou, na falta dele, da variável de ambiente de mesmo nome (execução sem secrets.toml)"""
+    try:
+        valor = st.secrets.get(nome)
+    except FileNotFoundError:
+        valor = None
+    if valor is None:
+        valor = os.environ.get(nome, padrao)
+    return valor
+
+def obter_backend_banco():
+    backend = str(obter_configuracao('DB_BACKEND', 'postgres')).lower()
+    if backend not in BACKENDS_BANCO:
+        raise ValueError(f"DB_BACKEND inválido: {backend} (use {' ou '.join(BACKENDS_BANCO)})")
+    return backend
+
+def _configuracao_pool():
+    config = {}
+    for nome, padrao in POOL_PADRAO.items():
+        valor = obter_configuracao(nome, padrao)
+        if isinstance(padrao, bool):
+            config[nome] = str(valor).lower() in ('1', 'true', 'sim', 'yes')
+        else:
+            config[nome] = int(valor)
+    return config
+
+def _url_postgres():
+    database_url = obter_configuracao("DATABASE_URL", "")
+    if database_url:
+        return database_url
+    
+    # Construir URL a partir de componentes
+    DB_USER = obter_configuracao("DB_USER", "")
+    DB_PASSWORD = obter_configuracao("DB_PASSWORD", "")
+    DB_HOST = obter_configuracao("DB_HOST", "")
+    DB_PORT = obter_configuracao("DB_PORT", "5432")
+    DB_NAME = obter_configuracao("DB_NAME", "")
+    
+    if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
+        return None
+    return f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+def _configurar_sqlite(engine):
+    """WAL e controle de transação pelo SQLAlchemy no SQLite"""
+    @event.listens_for(engine, 'connect')
+    def _configurar_conexao(dbapi_conn, _):
+        # O driver sqlite3 abre transações por conta própria e quebra SAVEPOINT: o BEGIN passa a ser emitido abaixo
+        dbapi_conn.isolation_level = None
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")  # leitores não bloqueiam o escritor
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+    
+    @event.listens_for(engine, 'begin')
+    def _iniciar_transacao(conn):
+        opcoes = conn.get_execution_options()
+        if opcoes.get('isolation_level') == 'AUTOCOMMIT':
+            return
+        # Escritas pegam a trava já no BEGIN: promover uma leitura a escrita falharia com SQLITE_BUSY
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if opcoes.get('escrita') else "BEGIN")
 
 @st.cache_resource
 def get_db_engine():
     """Retorna engine do banco de dados com correção para SQLAlchemy 2.x"""
     try:
-        from sqlalchemy import create_engine
-        
-        # Verificar se as credenciais estão disponíveis
-        database_url = st.secrets.get("DATABASE_URL", "")
+        pool = _configuracao_pool()
+        opcoes_pool = dict(
+            poolclass=QueuePoolInstrumentado,
+            pool_size=pool['DB_POOL_SIZE'],
+            max_overflow=pool['DB_MAX_OVERFLOW'],
+            pool_timeout=pool['DB_POOL_TIMEOUT'],
+            pool_recycle=pool['DB_POOL_RECYCLE'],
+            pool_pre_ping=pool['DB_POOL_PRE_PING'],
+        )
         
-        if database_url:
-            st.info(f"🔗 Usando DATABASE_URL para conexão")
+        if obter_backend_banco() == 'sqlite':
+            caminho = obter_configuracao('DB_SQLITE_PATH', CAMINHO_SQLITE_PADRAO)
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
             engine = create_engine(
-                database_url,
-                connect_args={"sslmode": "require"},
-                echo=False
+                f'sqlite:///{caminho}',
+                connect_args={'check_same_thread': False, 'timeout': 30},
+                echo=False,
+                **opcoes_pool
             )
+            _configurar_sqlite(engine)
         else:
-            # Construir URL a partir de componentes
-            DB_USER = st.secrets.get("DB_USER", "")
-            DB_PASSWORD = st.secrets.get("DB_PASSWORD", "")
-            DB_HOST = st.secrets.get("DB_HOST", "")
-            DB_PORT = st.secrets.get("DB_PORT", "5432")
-            DB_NAME = st.secrets.get("DB_NAME", "")
-            
-            if not all([DB_USER, DB_PASSWORD, DB_HOST, DB_NAME]):
+            database_url = _url_postgres()
+            if not database_url:
                 st.error("❌ Credenciais do banco incompletas")
                 return None
             
-            connection_string = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-            st.info(f"🔗 Conectando ao banco: {DB_HOST}:{DB_PORT}/{DB_NAME}")
-            
             engine = create_engine(
-                connection_string,
-                connect_args={"sslmode": "require"},
-                echo=False
+                database_url,
+                connect_args={"sslmode": obter_configuracao("DB_SSLMODE", "require")},
+                echo=False,
+                **opcoes_pool
             )
         
-        # Testar conexão usando text() - CORREÇÃO PRINCIPAL
+        # Falha cedo com credenciais inválidas (sem mensagens: o recurso é criado uma vez por processo)
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
-            st.success("✅ Conexão com banco estabelecida")
         
         return engine
     
-    except ImportError:
-        st.error("❌ SQLAlchemy não instalado")
-        return None
     except Exception as e:
         st.error(f"❌ Erro ao conectar ao banco: {str(e)}")
         return None
 
+def obter_metricas_pool():
+    """Métricas do pool de conexões: checkouts, espera, overflow e conexões em uso/ociosas"""
+    engine = get_db_engine()
+    if engine is None or not isinstance(engine.pool, QueuePoolInstrumentado):
+        return {}
+    
+    pool = engine.pool
+    with pool._trava_metricas:
+        metricas = dict(pool.metricas)
+    
+    tentativas = metricas['checkouts'] + metricas['timeouts']
+    metricas['espera_media_ms'] = round(metricas['espera_total_s'] / tentativas * 1000, 3) if tentativas else 0.0
+    metricas['espera_max_ms'] = round(metricas.pop('espera_max_s') * 1000, 3)
+    metricas['espera_total_s'] = round(metricas['espera_total_s'], 3)
+    metricas.update({
+        'tamanho': pool.size(),
+        'em_uso': pool.checkedout(),
+        'ociosas': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'max_overflow': pool._max_overflow,
+    })
+    return metricas
+
+# Conexão da operação lógica corrente (por thread/sessão do Streamlit)
+_conexao_atual = ContextVar('conexao_banco', default=None)
+
+@contextmanager
+def conexao_banco(transacao=False):
+    """Conexão da operação lógica corrente: chamadas aninhadas reutilizam a mesma conexão do pool
+    
+    Com transacao=True abre (ou reaproveita) uma transação com commit ao final do bloco mais externo.
+    Um bloco transacional dentro de um bloco só de leitura usa conexão própria, para não herdar uma
+    transação que nunca receberia commit.
+    """
+    atual = _conexao_atual.get()
+    if atual is not None and (atual['transacao'] or not transacao):
+        yield atual['conexao']
+        return
+    
+    engine = get_db_engine()
+    if engine is None:
+        raise RuntimeError("Conexão com banco não disponível")
+    
+    with engine.connect() as conn:
+        token = _conexao_atual.set({'conexao': conn, 'transacao': transacao})
+        try:
+            if transacao:
+                # 'escrita' faz o SQLite abrir com BEGIN IMMEDIATE; nos demais bancos não tem efeito
+                with conn.execution_options(escrita=True).begin():
+                    yield conn
+            else:
+                yield conn
+        finally:
+            _conexao_atual.reset(token)
+
+def em_transacao_banco():
+    """Se a operação corrente está dentro de um bloco conexao_banco(transacao=True)"""
+    atual = _conexao_atual.get()
+    return atual is not None and atual['transacao']
+
 def get_s3_client():
     """Retorna cliente S3 ou None se não configurado"""
     try: